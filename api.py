@@ -1,10 +1,22 @@
 from ninja import NinjaAPI
+from posts.renderers import ORJSONRenderer
 from posts.services import JWTBearer
-from posts.urls import post_router, comment_router, user_router, analytics_router
+from posts.urls import (
+    post_router,
+    comment_router,
+    user_router,
+    analytics_router,
+    health_router,
+    metrics_router,
+    search_router,
+)
 
-api = NinjaAPI()
+api = NinjaAPI(renderer=ORJSONRenderer())
 
 api.add_router("/posts/", post_router, auth=JWTBearer())
 api.add_router("/comments/", comment_router, auth=JWTBearer())
 api.add_router("/register/", user_router)
 api.add_router("/analytics/", analytics_router)
+api.add_router("/health/", health_router)
+api.add_router("/metrics", metrics_router)
+api.add_router("/search", search_router, auth=JWTBearer())
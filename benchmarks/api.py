@@ -0,0 +1,422 @@
+"""Throughput and p50/p99 latency for every API route.
+
+Seeds a throwaway test database, then drives each route sequentially through
+Django's test client. The stub models are used unless --backend says
+otherwise. Results are written as JSON. The run exits non-zero when a route
+answers with anything but 200; pass a previous run as --baseline to also fail
+when a route got slower than --tolerance allows or its status codes changed:
+
+    python benchmarks/api.py --comments 1000000 --output baseline.json
+    python benchmarks/api.py --comments 1000000 --baseline baseline.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangoProject.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from posts.inference import registry  # noqa: E402
+from posts.models import Comment, Post, User  # noqa: E402
+from posts.stats import (  # noqa: E402
+    comment_date,
+    rebuild_daily_stats,
+    reconcile_comment_counts,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+# Every route is built to succeed, so any other status means it is broken.
+EXPECTED_STATUSES = {"200"}
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua"
+).split()
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def seed(rng, users, posts, comments, days, batch_size):
+    now = timezone.now()
+
+    def created_at():
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    authors = User.objects.bulk_create(
+        User(username=f"bench{i}", email=f"bench{i}@example.com", password="!")
+        for i in range(users)
+    )
+    post_ids = [
+        post.id
+        for post in Post.objects.bulk_create(
+            (
+                Post(
+                    title=sentence(rng, 6),
+                    content=sentence(rng, 60),
+                    author=rng.choice(authors),
+                    created_at=created_at(),
+                )
+                for _ in range(posts)
+            ),
+            batch_size=batch_size,
+        )
+    ]
+
+    # Comments are skewed towards the first posts, like real threads are.
+    for start in range(0, comments, batch_size):
+        Comment.objects.bulk_create(
+            Comment(
+                post_id=post_ids[min(int(rng.paretovariate(1.2)) - 1, posts - 1)],
+                author=rng.choice(authors),
+                content=sentence(rng, 15),
+                created_at=created_at(),
+                blocked=rng.random() < 0.05,
+            )
+            for _ in range(min(batch_size, comments - start))
+        )
+
+    rebuild_daily_stats(comment_date(now - timedelta(days=days)), comment_date(now))
+    reconcile_comment_counts()
+    return authors, post_ids
+
+
+def routes(context):
+    """Map route names to functions building the ``i``-th request."""
+    author = context["author"].id
+    busy_post = context["post_ids"][0]
+    quiet_post = context["post_ids"][-1]
+    today = comment_date(timezone.now()).isoformat()
+    first_day = context["first_day"].isoformat()
+    serial = itertools.count()
+
+    def post_payload(i):
+        return {
+            "title": f"Benchmark post {i}",
+            "content": f"Benchmark content {i}",
+            "author": author,
+            "auto_reply_enabled": False,
+            "auto_reply_delay": 0,
+        }
+
+    def comment_payload(i, post_id=busy_post):
+        return {
+            "post_id": post_id,
+            "content": f"Benchmark comment {i}",
+            "author_id": author,
+        }
+
+    def register_payload(i):
+        n = next(serial)
+        return {
+            "username": f"load{n}",
+            "password": "benchmark",
+            "email": f"load{n}@example.com",
+        }
+
+    return {
+        "list_posts": lambda i: ("get", "/api/posts/", None),
+        "create_post": lambda i: ("post", "/api/posts/create/", post_payload(i)),
+        "export_posts": lambda i: ("get", "/api/posts/export", None),
+        "retrieve_post": lambda i: (
+            "get",
+            f"/api/posts/{context['post_ids'][i % len(context['post_ids'])]}/",
+            None,
+        ),
+        "update_post": lambda i: ("put", f"/api/posts/{quiet_post}/", post_payload(i)),
+        "patch_post": lambda i: (
+            "patch",
+            f"/api/posts/{quiet_post}/",
+            {"title": f"Patched post {i}"},
+        ),
+        "delete_post": lambda i: (
+            "delete",
+            f"/api/posts/{context['doomed_posts'][i]}/",
+            None,
+        ),
+        "list_comments": lambda i: ("get", f"/api/posts/{busy_post}/comments", None),
+        "export_post_comments": lambda i: (
+            "get",
+            f"/api/posts/{quiet_post}/comments/export",
+            None,
+        ),
+        "create_comment": lambda i: (
+            "post",
+            "/api/comments/create",
+            comment_payload(i),
+        ),
+        "bulk_create_comments": lambda i: (
+            "post",
+            "/api/comments/bulk",
+            [comment_payload(f"{i}.{n}") for n in range(context["bulk_size"])],
+        ),
+        "export_comments": lambda i: (
+            "get",
+            f"/api/comments/export?date_from={today}&date_to={today}",
+            None,
+        ),
+        "update_comment": lambda i: (
+            "put",
+            f"/api/comments/{context['comment_id']}/",
+            comment_payload(i),
+        ),
+        "patch_comment": lambda i: (
+            "patch",
+            f"/api/comments/{context['comment_id']}/",
+            {"content": f"Patched comment {i}"},
+        ),
+        "delete_comment": lambda i: (
+            "delete",
+            f"/api/comments/{context['doomed_comments'][i]}/",
+            None,
+        ),
+        "register_user": lambda i: ("post", "/api/register/", register_payload(i)),
+        "comments_daily_breakdown": lambda i: (
+            "get",
+            f"/api/analytics/comments-daily-breakdown?date_from={first_day}&date_to={today}",
+            None,
+        ),
+        # Seeded text is made of WORDS, so these terms match many rows.
+        "search_posts": lambda i: ("get", "/api/search?q=lorem+dolor", None),
+        "search_comments": lambda i: (
+            "get",
+            "/api/search?q=lorem+dolor&scope=comments",
+            None,
+        ),
+        "health_ready": lambda i: ("get", "/api/health/ready", None),
+        "metrics": lambda i: ("get", "/api/metrics", None),
+    }
+
+
+def prepare_deletes(context, count):
+    author = context["author"]
+    context["doomed_posts"] = [
+        post.id
+        for post in Post.objects.bulk_create(
+            Post(title="Doomed", content="Doomed", author=author) for _ in range(count)
+        )
+    ]
+    thread = Post.objects.create(title="Doomed", content="Doomed", author=author)
+    context["doomed_comments"] = [
+        comment.id
+        for comment in Comment.objects.bulk_create(
+            Comment(post=thread, content="Doomed", author=author) for _ in range(count)
+        )
+    ]
+
+
+def send(client, headers, method, path, payload):
+    kwargs = {"headers": headers}
+    if payload is not None:
+        kwargs.update(data=json.dumps(payload), content_type="application/json")
+    response = getattr(client, method)(path, **kwargs)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response.status_code
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(client, headers, build, requests, warmup):
+    for i in range(warmup):
+        send(client, headers, *build(i))
+
+    timings, statuses = [], {}
+    started = time.perf_counter()
+    for i in range(warmup, warmup + requests):
+        request_started = time.perf_counter()
+        status = send(client, headers, *build(i))
+        timings.append(time.perf_counter() - request_started)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "rps": round(requests / elapsed, 2),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "statuses": statuses,
+    }
+
+
+def unexpected_statuses(results):
+    """Yield ``(route, statuses)`` for routes that answered anything but 200.
+
+    A route failing fast would otherwise look like a speed-up.
+    """
+    for name, current in results["routes"].items():
+        if set(current["statuses"]) - EXPECTED_STATUSES:
+            yield name, current["statuses"]
+
+
+def regressions(results, baseline, tolerance):
+    """Yield ``(route, metric, baseline, current)`` for routes that got worse.
+
+    Worse means slower, or answering with a different set of status codes.
+    """
+    for name, current in results["routes"].items():
+        previous = baseline["routes"].get(name)
+        if previous is None:
+            continue
+        if set(current["statuses"]) != set(previous["statuses"]):
+            yield name, "statuses", previous["statuses"], current["statuses"]
+        for metric in ("p50_ms", "p99_ms"):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                yield name, metric, previous[metric], current[metric]
+        if current["rps"] < previous["rps"] / (1 + tolerance):
+            yield name, "rps", previous["rps"], current["rps"]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=1_000)
+    parser.add_argument("--comments", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--bulk-size", type=int, default=100)
+    parser.add_argument("--routes", nargs="+", help="Only run these routes.")
+    parser.add_argument("--backend", default="stub")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Disable the response cache."
+    )
+    parser.add_argument(
+        "--admission",
+        action="store_true",
+        help="Keep POSTS_ADMISSION_LIMITS on; by default the write routes "
+        "would mostly measure 429 responses.",
+    )
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"))
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    overrides = {"POSTS_INFERENCE_BACKEND": args.backend}
+    if args.no_cache:
+        overrides["POSTS_RESPONSE_CACHE_TTL"] = 0
+    if not args.admission:
+        overrides["POSTS_ADMISSION_LIMITS"] = {}
+
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        with override_settings(**overrides):
+            started = time.perf_counter()
+            authors, post_ids = seed(
+                random.Random(args.seed),
+                args.users,
+                args.posts,
+                args.comments,
+                args.days,
+                batch_size=10_000,
+            )
+            print(f"Seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+            registry.warm_up()
+            context = {
+                "author": authors[0],
+                "post_ids": post_ids,
+                "first_day": comment_date(timezone.now() - timedelta(days=args.days)),
+                "comment_id": Comment.objects.filter(post_id=post_ids[-1])
+                .values_list("id", flat=True)
+                .first()
+                or Comment.objects.values_list("id", flat=True).first(),
+                "bulk_size": args.bulk_size,
+            }
+            prepare_deletes(context, args.warmup + args.requests)
+
+            token = RefreshToken.for_user(authors[0]).access_token
+            headers = {"Authorization": f"Bearer {token}"}
+            client = Client()
+
+            available = routes(context)
+            unknown = set(args.routes or ()) - set(available)
+            if unknown:
+                parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+            results = {
+                "meta": {
+                    "revision": git_revision(),
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "database": connection.vendor,
+                    "backend": args.backend,
+                    "response_cache": not args.no_cache,
+                    "admission": args.admission,
+                    "users": args.users,
+                    "posts": args.posts,
+                    "comments": args.comments,
+                    "requests": args.requests,
+                },
+                "routes": {},
+            }
+            print(f"{'route':<26}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+            for name, build in available.items():
+                if args.routes and name not in args.routes:
+                    continue
+                cache.clear()
+                stats = measure(client, headers, build, args.requests, args.warmup)
+                results["routes"][name] = stats
+                print(
+                    f"{name:<26}{stats['rps']:>10.1f}"
+                    f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    failed = list(unexpected_statuses(results))
+    for name, statuses in failed:
+        print(f"FAILED {name}: statuses {statuses}", file=sys.stderr)
+
+    slower = []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        slower = list(regressions(results, baseline, args.tolerance))
+        for name, metric, before, after in slower:
+            print(f"REGRESSION {name} {metric}: {before} -> {after}", file=sys.stderr)
+    if failed or slower:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
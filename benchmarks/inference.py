@@ -0,0 +1,125 @@
+"""Latency and memory of the inference backends on this machine.
+
+Each backend is loaded in its own subprocess so resident memory is measured
+in isolation:
+
+    python benchmarks/inference.py transformers quantized onnx --output inference.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangoProject.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from posts.inference import get_backend  # noqa: E402
+from posts.management.commands.check_inference_parity import (  # noqa: E402
+    GREEDY,
+    SAMPLE_TEXTS,
+)
+from posts.services import build_reply_prompt  # noqa: E402
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak rather than current RSS, in KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+        "p99_ms": round(
+            timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 2
+        ),
+    }
+
+
+def run(name, repeat):
+    backend = get_backend(name)
+    baseline = rss_mb()
+
+    started = time.perf_counter()
+    classifier = backend.classifier()
+    generator = backend.text_generator()
+    load_seconds = time.perf_counter() - started
+
+    batch = (SAMPLE_TEXTS * 2)[:16]
+    prompt = build_reply_prompt("Our new CPU nodes are live.", SAMPLE_TEXTS[0])
+    classifier(batch, batch_size=16, truncation=True)
+    generator(prompt, **GREEDY)
+
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "rss_mb": round(rss_mb() - baseline, 1),
+        "classify_one": timed(lambda: classifier(batch[0], truncation=True), repeat),
+        "classify_16": timed(
+            lambda: classifier(batch, batch_size=16, truncation=True), repeat
+        ),
+        "generate_one": timed(lambda: generator(prompt, **GREEDY), max(1, repeat // 5)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("backends", nargs="+")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", type=Path, default=Path("inference.json"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.backends[0], args.repeat)))
+        return
+
+    results = {}
+    for name in args.backends:
+        child = subprocess.run(
+            [sys.executable, __file__, name, "--child", f"--repeat={args.repeat}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results[name] = json.loads(child.stdout.strip().splitlines()[-1])
+
+    print(
+        f"{'backend':<14}{'load s':>8}{'RSS MB':>9}{'clf p50':>9}"
+        f"{'clf16 p50':>11}{'gen p50':>9}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<14}{result['load_seconds']:>8.1f}{result['rss_mb']:>9.0f}"
+            f"{result['classify_one']['p50_ms']:>9.1f}"
+            f"{result['classify_16']['p50_ms']:>11.1f}"
+            f"{result['generate_one']['p50_ms']:>9.1f}"
+        )
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
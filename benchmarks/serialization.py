@@ -0,0 +1,120 @@
+"""Per-row cost of serializing list endpoints, old path vs .values() + orjson.
+
+Runs against a throwaway test database:
+
+    python benchmarks/serialization.py --rows 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangoProject.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from ninja.responses import NinjaJSONEncoder  # noqa: E402
+
+from posts.models import Comment, Post, User  # noqa: E402
+from posts.renderers import dumps  # noqa: E402
+from posts.schemas import CommentOutSchema, PostOutSchema  # noqa: E402
+from posts.views import COMMENT_FIELDS, POST_FIELDS, comment_row, post_row  # noqa: E402
+
+
+def seed(rows):
+    user = User.objects.create_user(username="bench", password="bench")
+    Post.objects.bulk_create(
+        Post(title=f"Post {i}", content="Lorem ipsum " * 20, author=user)
+        for i in range(rows)
+    )
+    post = Post.objects.first()
+    Comment.objects.bulk_create(
+        Comment(post=post, content="Lorem ipsum dolor sit amet " * 4, author=user)
+        for _ in range(rows)
+    )
+    return post
+
+
+def posts_before(post):
+    posts = Post.objects.all().prefetch_related("author")
+    items = [
+        PostOutSchema(
+            id=post.id,
+            title=post.title,
+            content=post.content,
+            author={"id": post.author.id, "username": post.author.username},
+            created_at=post.created_at,
+            auto_reply_enabled=post.auto_reply_enabled,
+            comment_count=post.comment_count,
+            blocked_comment_count=post.blocked_comment_count,
+        )
+        for post in posts
+    ]
+    return json.dumps(items, cls=NinjaJSONEncoder)
+
+
+def posts_after(post):
+    return dumps([post_row(row) for row in Post.objects.values(*POST_FIELDS)])
+
+
+def comments_before(post):
+    comments = post.comments.filter(blocked=False).select_related("author")
+    items = [
+        CommentOutSchema(
+            id=comment.id,
+            content=comment.content,
+            author=comment.author.username,
+            created_at=comment.created_at,
+        )
+        for comment in comments
+    ]
+    return json.dumps(items, cls=NinjaJSONEncoder)
+
+
+def comments_after(post):
+    rows = post.comments.filter(blocked=False).values(*COMMENT_FIELDS)
+    return dumps([comment_row(row) for row in rows])
+
+
+def best_of(func, post, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(post)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        post = seed(args.rows)
+        print(
+            f"{'endpoint':<15}{'before µs/row':>15}{'after µs/row':>15}{'speedup':>10}"
+        )
+        for name, before, after in [
+            ("list_posts", posts_before, posts_after),
+            ("list_comments", comments_before, comments_after),
+        ]:
+            old = best_of(before, post, args.repeat) / args.rows * 1e6
+            new = best_of(after, post, args.repeat) / args.rows * 1e6
+            print(f"{name:<15}{old:>15.2f}{new:>15.2f}{old / new:>9.1f}x")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "posts.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -138,3 +140,225 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=61),
     "ROTATE_REFRESH_TOKENS": True,
 }
+
+# Inference
+# "transformers" loads the Hugging Face pipelines, "quantized" the same pipelines
+# with int8 dynamic quantization, "onnx" runs them with ONNX Runtime (needs
+# optimum[onnxruntime]) and "stub" uses cheap fakes for tests. Check a backend
+# against "transformers" with `manage.py check_inference_parity`.
+
+POSTS_INFERENCE_BACKEND = os.environ.get("POSTS_INFERENCE_BACKEND", "transformers")
+
+POSTS_TOXICITY_MODEL = "unitary/toxic-bert"
+
+POSTS_GENERATION_MODEL = "gpt2"
+
+# Models this process serves. /api/health/ready waits only for these and
+# POSTS_WARM_MODELS_ON_STARTUP loads only these. Web workers only moderate;
+# `run_auto_replies` loads the generator on its own.
+
+POSTS_REQUIRED_MODELS = ["classifier"]
+
+POSTS_WARM_MODELS_ON_STARTUP = False
+
+POSTS_ONNX_DIR = BASE_DIR / "onnx"
+
+# With POSTS_INFERENCE_BACKEND = "sidecar", web workers send inference to
+# `manage.py run_inference_server`, which loads POSTS_SIDECAR_BACKEND once per
+# host and batches requests from all workers.
+
+POSTS_SIDECAR_SOCKET = os.environ.get(
+    "POSTS_SIDECAR_SOCKET", "/tmp/posts-inference.sock"
+)
+
+POSTS_SIDECAR_BACKEND = "transformers"
+
+# A lexical pre-filter settles obvious cases before the classifier: text with
+# at least POSTS_MODERATION_MIN_BLOCK_MATCHES blocklisted terms is toxic, and
+# text of at most POSTS_MODERATION_MAX_CLEAN_WORDS allowlisted words is clean.
+# Only unambiguous terms belong on the blocklist; everything else is scored.
+
+POSTS_MODERATION_PREFILTER = True
+
+POSTS_MODERATION_BLOCKLIST = [
+    "fuck you",
+    "kill yourself",
+    "kys",
+    "piece of shit",
+    "shut up idiot",
+    "you idiot",
+    "you moron",
+    "you are an idiot",
+    "you are a moron",
+    "you're an idiot",
+    "you're a moron",
+]
+
+POSTS_MODERATION_ALLOWLIST = [
+    "agreed",
+    "amazing",
+    "awesome",
+    "cool",
+    "great",
+    "helpful",
+    "interesting",
+    "lol",
+    "nice",
+    "ok",
+    "okay",
+    "post",
+    "thank",
+    "thanks",
+    "this",
+    "very",
+    "wow",
+    "yes",
+    "you",
+]
+
+POSTS_MODERATION_MIN_BLOCK_MATCHES = 1
+
+POSTS_MODERATION_MAX_CLEAN_WORDS = 4
+
+# Concurrent moderation requests are classified together in batches of up to
+# POSTS_MODERATION_BATCH_SIZE, waiting at most POSTS_MODERATION_MAX_WAIT_MS to fill one.
+
+POSTS_MODERATION_BATCH_SIZE = 16
+
+POSTS_MODERATION_MAX_WAIT_MS = 5
+
+# Toxicity scores are cached by normalized content hash: in-process for
+# POSTS_MODERATION_CACHE_TTL seconds and, when persisted, in the database.
+
+POSTS_MODERATION_CACHE_SIZE = 10000
+
+POSTS_MODERATION_CACHE_TTL = 60 * 60
+
+POSTS_MODERATION_CACHE_PERSIST = True
+
+# Comments store their toxicity score and the model that produced it, and are
+# blocked when the score is above POSTS_TOXICITY_THRESHOLD. After changing the
+# threshold run `manage.py apply_toxicity_threshold`; after changing the model,
+# `manage.py remoderate_comments`, which scores POSTS_REMODERATION_BATCH_SIZE
+# comments per batch.
+
+POSTS_TOXICITY_THRESHOLD = 0.5
+
+POSTS_REMODERATION_BATCH_SIZE = 512
+
+# Auto-replies are stored as AutoReplyJob rows and run by `manage.py run_auto_replies`.
+
+POSTS_AUTO_REPLY_WORKERS = 8
+
+POSTS_AUTO_REPLY_BATCH_SIZE = 32
+
+POSTS_AUTO_REPLY_POLL_INTERVAL = 1.0
+
+POSTS_AUTO_REPLY_MAX_ATTEMPTS = 3
+
+POSTS_AUTO_REPLY_RETRY_DELAY = 30
+
+POSTS_AUTO_REPLY_STALE_AFTER = 5 * 60
+
+# Concurrent reply prompts are generated together in padded batches.
+# Keep POSTS_AUTO_REPLY_WORKERS at least as large as the batch size to fill them.
+
+POSTS_GENERATION_BATCH_SIZE = 8
+
+POSTS_GENERATION_MAX_WAIT_MS = 20
+
+# Serve the post and comment endpoints with async views. Model inference then
+# runs on a pool of POSTS_INFERENCE_WORKERS threads instead of the event loop.
+
+POSTS_ASYNC_VIEWS = os.environ.get("POSTS_ASYNC_VIEWS") == "1"
+
+POSTS_INFERENCE_WORKERS = 4
+
+# Admission control for the endpoints that run moderation. Each entry caps
+# requests in flight ("concurrency"), the endpoint's rate ("rate"/"burst",
+# per second) and each user's rate ("user_rate"/"user_burst"). Requests over a
+# user's rate get 429, the rest of the shed requests 503, both with Retry-After.
+# Endpoints without an entry, including every read endpoint, are not limited.
+
+POSTS_ADMISSION_LIMITS = {
+    "create_post": {"concurrency": 8, "user_rate": 1, "user_burst": 10},
+    "create_comment": {"concurrency": 16, "user_rate": 2, "user_burst": 20},
+    "bulk_create_comments": {"concurrency": 2, "user_rate": 0.1, "user_burst": 2},
+    "patch_post": {"concurrency": 8, "user_rate": 1, "user_burst": 10},
+    "patch_comment": {"concurrency": 8, "user_rate": 1, "user_burst": 10},
+}
+
+# Retry-After, in seconds, for requests shed because an endpoint is at capacity.
+POSTS_ADMISSION_RETRY_AFTER = 1
+
+# Per-user token buckets kept per endpoint; least recently seen users are dropped.
+POSTS_ADMISSION_MAX_USERS = 10000
+
+# Cursor pagination for list_posts and list_comments.
+
+POSTS_PAGE_SIZE = 50
+
+POSTS_MAX_PAGE_SIZE = 200
+
+# Verified access tokens are cached (by digest) until they expire, at most
+# POSTS_JWT_CACHE_SIZE of them. revoke_token() rejects a token until it expires,
+# but only in the process that called it.
+
+POSTS_JWT_CACHE_SIZE = 10000
+
+# Rendered post detail and list responses are cached and served with
+# ETag/Last-Modified; writes to posts invalidate them. Every list page shares
+# one version that moves on any post write, comment writes included, so under
+# comment traffic list responses are rarely served from the cache.
+
+POSTS_RESPONSE_CACHE_TTL = 5 * 60
+
+# The cache must be shared by all worker processes, or a write only invalidates
+# the worker that handled it (system check posts.E001 rejects LocMemCache).
+# The database cache needs `manage.py createcachetable`; set POSTS_REDIS_URL to
+# use Redis instead (needs the redis package).
+
+if os.environ.get("POSTS_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["POSTS_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "posts_response_cache",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
+# Rows fetched per database round trip by the NDJSON export endpoints.
+
+POSTS_EXPORT_CHUNK_SIZE = 2000
+
+# Bulk comment ingestion (`POST /api/comments/bulk`).
+
+POSTS_BULK_MAX_ITEMS = 1000
+
+POSTS_BULK_INSERT_BATCH_SIZE = 500
+
+# Request metrics are exposed at /api/metrics. Set a sample rate above zero to
+# dump cProfile stats for that fraction of requests into POSTS_PROFILE_DIR.
+
+POSTS_PROFILE_SAMPLE_RATE = 0.0
+
+POSTS_PROFILE_DIR = BASE_DIR / "profiles"
+
+# delete_post only hides a post. `manage.py purge_deleted_posts` then removes
+# its comments in transactions of at most POSTS_PURGE_BATCH_SIZE rows.
+
+POSTS_PURGE_BATCH_SIZE = 1000
+
+POSTS_PURGE_POLL_INTERVAL = 30
+
+# Backend behind `GET /api/search`. "sqlite_fts" reads the FTS5 indexes that
+# migration 0012 creates and keeps in sync with triggers.
+
+POSTS_SEARCH_BACKEND = "sqlite_fts"
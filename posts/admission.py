@@ -0,0 +1,225 @@
+import base64
+import functools
+import inspect
+import json
+import math
+import threading
+import time
+
+from cachetools import LRUCache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.http import JsonResponse
+
+from .metrics import metrics
+
+
+class Overloaded(Exception):
+    """A request was shed; ``status`` is 429 or 503."""
+
+    def __init__(self, status, retry_after, reason):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take one token, or return the seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def give_back(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class EndpointLimiter:
+    """Concurrency cap plus endpoint-wide and per-user token buckets."""
+
+    def __init__(
+        self,
+        concurrency=None,
+        rate=None,
+        burst=None,
+        user_rate=None,
+        user_burst=None,
+        max_users=10000,
+    ):
+        # A bucket must hold at least one token, or a rate below 1/s would
+        # never admit anything.
+        if (burst is not None and burst < 1) or (
+            user_burst is not None and user_burst < 1
+        ):
+            raise ImproperlyConfigured("Admission bursts must be at least 1.")
+        self.slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self.bucket = TokenBucket(rate, burst or max(1, rate)) if rate else None
+        self.user_rate = user_rate
+        self.user_burst = user_burst or max(1, user_rate or 0)
+        self._users = LRUCache(maxsize=max_users)
+        self._lock = threading.Lock()
+
+    def user_bucket(self, user):
+        with self._lock:
+            bucket = self._users.get(user)
+            if bucket is None:
+                bucket = self._users[user] = TokenBucket(
+                    self.user_rate, self.user_burst
+                )
+            return bucket
+
+    def admit(self, user):
+        """Reserve a slot for ``user`` or raise Overloaded; pair with release().
+
+        Endpoint capacity is checked first, so a request shed with 503 never
+        spends its user's rate.
+        """
+        if self.bucket is not None:
+            wait = self.bucket.take()
+            if wait:
+                raise Overloaded(503, wait, "endpoint_rate")
+        if self.slots is not None and not self.slots.acquire(blocking=False):
+            self._give_back_endpoint_token()
+            raise Overloaded(503, settings.POSTS_ADMISSION_RETRY_AFTER, "concurrency")
+        if self.user_rate:
+            wait = self.user_bucket(user).take()
+            if wait:
+                self.release()
+                self._give_back_endpoint_token()
+                raise Overloaded(429, wait, "user_rate")
+
+    def _give_back_endpoint_token(self):
+        if self.bucket is not None:
+            self.bucket.give_back()
+
+    def release(self):
+        if self.slots is not None:
+            self.slots.release()
+
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def get_limiter(endpoint):
+    config = settings.POSTS_ADMISSION_LIMITS.get(endpoint)
+    if not config:
+        return None
+    limiter = _limiters.get(endpoint)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(endpoint)
+            if limiter is None:
+                limiter = _limiters[endpoint] = EndpointLimiter(
+                    **config, max_users=settings.POSTS_ADMISSION_MAX_USERS
+                )
+    return limiter
+
+
+def user_key(request):
+    # JWTBearer has already verified the token, so its payload can be read
+    # without checking the signature again.
+    token = getattr(request, "auth", None)
+    if isinstance(token, str) and token.count(".") == 2:
+        payload = token.split(".")[1]
+        try:
+            claims = json.loads(
+                base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+            )
+            return f"user:{claims['user_id']}"
+        except (ValueError, KeyError, TypeError):
+            pass
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def shed_response(exc):
+    message = (
+        "Too many requests, retry later."
+        if exc.status == 429
+        else "Server is busy, retry later."
+    )
+    response = JsonResponse({"error": message}, status=exc.status)
+    response["Retry-After"] = str(max(1, math.ceil(exc.retry_after)))
+    return response
+
+
+def _admit(endpoint, request):
+    """Return ``(limiter, None)`` for an admitted request, else ``(None, response)``."""
+    limiter = get_limiter(endpoint)
+    if limiter is None:
+        return None, None
+    try:
+        limiter.admit(user_key(request))
+    except Overloaded as exc:
+        metrics.increment(
+            "posts_admission_rejected_total",
+            labels={"endpoint": endpoint, "reason": exc.reason},
+            help="Requests shed by admission control, by endpoint and reason.",
+        )
+        return None, shed_response(exc)
+    return limiter, None
+
+
+def admission(endpoint):
+    """Shed load on an inference-backed view before it reaches the models.
+
+    Limits come from POSTS_ADMISSION_LIMITS[endpoint]. A request over its
+    user's rate gets 429; one over the endpoint's rate or concurrency gets
+    503. Both carry Retry-After and return at once instead of queueing.
+    """
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                limiter, shed = _admit(endpoint, request)
+                if shed is not None:
+                    return shed
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    if limiter is not None:
+                        limiter.release()
+
+        else:
+
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                limiter, shed = _admit(endpoint, request)
+                if shed is not None:
+                    return shed
+                try:
+                    return view(request, *args, **kwargs)
+                finally:
+                    if limiter is not None:
+                        limiter.release()
+
+        return wrapper
+
+    return decorator
+
+
+def _reset_limiters(setting, **kwargs):
+    if setting.startswith("POSTS_ADMISSION"):
+        _limiters.clear()
+
+
+setting_changed.connect(_reset_limiters)
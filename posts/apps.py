@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PostsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "posts"
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+
+        if settings.POSTS_WARM_MODELS_ON_STARTUP:
+            from .inference import registry
+
+            registry.warm_up(settings.POSTS_REQUIRED_MODELS)
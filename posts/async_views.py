@@ -0,0 +1,241 @@
+import asyncio
+from datetime import date
+from typing import List, Literal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404
+
+from .deletion import soft_delete_post
+from .inference import run_inference
+from .models import Post, Comment, User
+from .moderation import is_toxic, moderate
+from .pagination import build_page, keyset_queryset, page_size
+from .response_cache import (
+    acached_response,
+    invalidate_post,
+    list_changed_at,
+    post_detail_key,
+    post_list_key,
+)
+from .schemas import (
+    PostOutSchema,
+    PostCreateSchema,
+    PostPatchSchema,
+    CommentCreateSchema,
+    CommentPatchSchema,
+)
+from .services import check_for_toxicity
+from .renderers import dumps
+from .stats import created_between
+from .views import (
+    COMMENT_FIELDS,
+    EXPORT_COMMENT_FIELDS,
+    EXPORT_POST_FIELDS,
+    ingest_comments,
+    POST_FIELDS,
+    comment_export_row,
+    comment_row,
+    edit_comment,
+    edit_post,
+    invalid_cursor,
+    live_comments,
+    ndjson_response,
+    post_export_row,
+    post_row,
+    save_comment,
+    search as sync_search,
+)
+
+
+async def list_posts(request, cursor: str = None, limit: int = None):
+    limit = page_size(limit)
+    try:
+        posts = keyset_queryset(
+            Post.objects.values(*POST_FIELDS), cursor, limit, descending=True
+        )
+    except ValueError:
+        return invalid_cursor()
+
+    async def build():
+        page = build_page([post async for post in posts], limit, post_row)
+        return page, list_changed_at()
+
+    return await acached_response(request, post_list_key(cursor, limit), build)
+
+
+async def create_post(request, data: PostCreateSchema):
+    # Both checks are in flight at once, so they land in the same batch.
+    title_toxic, content_toxic = await asyncio.gather(
+        run_inference(check_for_toxicity, data.title),
+        run_inference(check_for_toxicity, data.content),
+    )
+    if title_toxic or content_toxic:
+        return {"message": "Post is blocked due to inappropriate content."}
+
+    author = await aget_object_or_404(User, id=data.author)
+
+    post = await Post.objects.acreate(
+        title=data.title,
+        content=data.content,
+        author=author,
+        auto_reply_enabled=data.auto_reply_enabled,
+        auto_reply_delay=data.auto_reply_delay,
+    )
+
+    invalidate_post()
+    return {"message": "Post created successfully", "post": post.id}
+
+
+async def retrieve_post(request, post_id: int) -> PostOutSchema:
+    async def build():
+        post = await aget_object_or_404(
+            Post.objects.values(*POST_FIELDS, "updated_at"), id=post_id
+        )
+        return post_row(post), post["updated_at"]
+
+    return await acached_response(request, post_detail_key(post_id), build)
+
+
+async def update_post(request, post_id: int, data: PostCreateSchema):
+    post = await aget_object_or_404(Post, id=post_id)
+    fields = data.model_dump()
+    for attr, value in fields.items():
+        if attr == "author":
+            post.author = await aget_object_or_404(User, id=value)
+        else:
+            setattr(post, attr, value)
+    await post.asave(update_fields=[*fields, "updated_at"])
+    invalidate_post(post_id)
+    return {"message": "Post updated successfully"}
+
+
+async def patch_post(request, post_id: int, data: PostPatchSchema):
+    return await run_inference(edit_post, post_id, data.model_dump(exclude_none=True))
+
+
+async def delete_post(request, post_id: int):
+    if not await sync_to_async(soft_delete_post)(post_id):
+        raise Http404("No Post matches the given query.")
+    invalidate_post(post_id)
+    return {"message": "Post deleted successfully"}
+
+
+async def create_comment(request, data: CommentCreateSchema):
+    post = await aget_object_or_404(Post, id=data.post_id)
+    author = await aget_object_or_404(User, id=data.author_id)
+
+    score, model = await run_inference(moderate, data.content)
+    if is_toxic(score):
+        await Comment.objects.acreate(
+            post=post,
+            content=data.content,
+            author=author,
+            blocked=True,
+            toxicity_score=score,
+            moderation_model=model,
+        )
+        return {"message": "Comment is blocked due to inappropriate content."}
+
+    await sync_to_async(save_comment)(post, author, data.content, score, model)
+
+    return {
+        "message": "Comment created successfully and auto-reply generated if enabled."
+    }
+
+
+async def bulk_create_comments(request, data: List[CommentCreateSchema]):
+    if len(data) > settings.POSTS_BULK_MAX_ITEMS:
+        return JsonResponse(
+            {"error": f"At most {settings.POSTS_BULK_MAX_ITEMS} comments per request."},
+            status=400,
+        )
+    return {"results": await run_inference(ingest_comments, data)}
+
+
+async def list_comments(request, post_id: int, cursor: str = None, limit: int = None):
+    post = await aget_object_or_404(Post, id=post_id)
+    limit = page_size(limit)
+    try:
+        comments = keyset_queryset(
+            post.comments.filter(blocked=False).values(*COMMENT_FIELDS),
+            cursor,
+            limit,
+        )
+    except ValueError:
+        return invalid_cursor()
+
+    return build_page([comment async for comment in comments], limit, comment_row)
+
+
+async def update_comment(request, comment_id: int, data: CommentCreateSchema):
+    comment = await aget_object_or_404(live_comments(), id=comment_id)
+    comment.content = data.content
+    comment.toxicity_score = None
+    comment.moderation_model = ""
+    await comment.asave()
+    return {"message": "Comment updated successfully"}
+
+
+async def patch_comment(request, comment_id: int, data: CommentPatchSchema):
+    return await run_inference(
+        edit_comment, comment_id, data.model_dump(exclude_none=True)
+    )
+
+
+async def delete_comment(request, comment_id: int):
+    comment = await aget_object_or_404(live_comments(), id=comment_id)
+    await comment.adelete()
+    return {"message": "Comment deleted successfully"}
+
+
+async def ndjson_lines(rows, serialize):
+    async for row in rows:
+        yield dumps(serialize(row)) + b"\n"
+
+
+async def export_posts(request, date_from: date = None, date_to: date = None):
+    posts = created_between(Post.objects.all(), date_from, date_to)
+    rows = posts.order_by("created_at", "id").values(*EXPORT_POST_FIELDS)
+    return ndjson_response(
+        ndjson_lines(
+            rows.aiterator(chunk_size=settings.POSTS_EXPORT_CHUNK_SIZE),
+            post_export_row,
+        ),
+        "posts.ndjson",
+    )
+
+
+async def export_comments(request, date_from: date = None, date_to: date = None):
+    comments = created_between(live_comments(), date_from, date_to)
+    rows = comments.order_by("created_at", "id").values(*EXPORT_COMMENT_FIELDS)
+    return ndjson_response(
+        ndjson_lines(
+            rows.aiterator(chunk_size=settings.POSTS_EXPORT_CHUNK_SIZE),
+            comment_export_row,
+        ),
+        "comments.ndjson",
+    )
+
+
+async def export_post_comments(request, post_id: int):
+    post = await aget_object_or_404(Post, id=post_id)
+    rows = post.comments.order_by("created_at", "id").values(*EXPORT_COMMENT_FIELDS)
+    return ndjson_response(
+        ndjson_lines(
+            rows.aiterator(chunk_size=settings.POSTS_EXPORT_CHUNK_SIZE),
+            comment_export_row,
+        ),
+        f"post-{post_id}-comments.ndjson",
+    )
+
+
+async def search(
+    request,
+    q: str,
+    scope: Literal["posts", "comments"] = "posts",
+    cursor: str = None,
+    limit: int = None,
+):
+    return await sync_to_async(sync_search)(request, q, scope, cursor, limit)
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, SimpleQueue
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item calls into batched handler calls.
+
+    ``handler`` receives a list of items and must return one result per item,
+    in order. A batch is flushed once it holds ``max_batch_size`` items or the
+    first item has waited ``max_wait_ms``.
+    """
+
+    def __init__(self, handler, max_batch_size=16, max_wait_ms=5):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._queue = SimpleQueue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def submit(self, item):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so pre-forked servers
+        # start their own in every child.
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._queue = SimpleQueue()
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.handler(items)
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
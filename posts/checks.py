@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+PROCESS_LOCAL_CACHES = {"django.core.cache.backends.locmem.LocMemCache"}
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """The response cache is invalidated on write, so workers must share it."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                f"The default cache ({backend}) is local to each process.",
+                hint="Post writes would not invalidate the cached responses of "
+                "other workers. Use the database cache or POSTS_REDIS_URL.",
+                id="posts.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,61 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AutoReplyJob, Comment, Post
+from .stats import apply_comment_deltas, comment_deltas
+
+
+def soft_delete_post(post_id):
+    """Hide a post right away; its rows are purged later. Returns False if missing."""
+    return bool(Post.objects.filter(id=post_id).update(deleted_at=timezone.now()))
+
+
+def _raw_delete(model, ids):
+    # A plain DELETE: no collector loading rows, no per-row signals.
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+
+
+def purge_comment_batch(post_id, batch_size):
+    """Delete up to ``batch_size`` comments of a post and return how many went."""
+    with transaction.atomic():
+        rows = list(
+            Comment.objects.filter(post_id=post_id)
+            .order_by("id")
+            .values_list("id", "created_at", "blocked")[:batch_size]
+        )
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+        AutoReplyJob.objects.filter(comment_id__in=ids).delete()
+        _raw_delete(Comment, ids)
+        apply_comment_deltas(
+            comment_deltas(
+                ((created_at, blocked) for _, created_at, blocked in rows), sign=-1
+            )
+        )
+    return len(rows)
+
+
+def purge_post(post_id, batch_size):
+    """Delete a soft-deleted post's comments batch by batch, then the post."""
+    purged = 0
+    while True:
+        deleted = purge_comment_batch(post_id, batch_size)
+        purged += deleted
+        if deleted < batch_size:
+            break
+    with transaction.atomic():
+        if not Comment.objects.filter(post_id=post_id).exists():
+            Post.all_objects.filter(id=post_id, deleted_at__isnull=False).delete()
+    return purged
+
+
+def deleted_post_ids():
+    return list(
+        Post.all_objects.filter(deleted_at__isnull=False)
+        .order_by("deleted_at")
+        .values_list("id", flat=True)
+    )
@@ -0,0 +1,77 @@
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+from .batching import MicroBatcher
+from .inference import get_text_generator
+from .metrics import metrics
+
+DEFAULT_SAMPLING = {"max_length": 30, "do_sample": True, "top_k": 50, "top_p": 0.95}
+
+
+def sampling_key(sampling):
+    return tuple(sorted({**DEFAULT_SAMPLING, **sampling}.items()))
+
+
+def generate_batch(items):
+    # Prompts can only share a forward pass when they share sampling params.
+    groups = {}
+    for index, (_, sampling) in enumerate(items):
+        groups.setdefault(sampling, []).append(index)
+
+    generator = get_text_generator()
+    texts = [None] * len(items)
+    for sampling, indexes in groups.items():
+        prompts = [items[index][0] for index in indexes]
+        with metrics.time_inference("text_generator", len(prompts)):
+            results = generator(
+                prompts,
+                batch_size=len(prompts),
+                num_return_sequences=1,
+                truncation=True,
+                **dict(sampling),
+            )
+        for index, result in zip(indexes, results):
+            texts[index] = result[0]["generated_text"]
+    return texts
+
+
+_batcher = None
+_lock = threading.Lock()
+
+
+def get_generation_batcher():
+    global _batcher
+    if _batcher is None:
+        with _lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    generate_batch,
+                    max_batch_size=settings.POSTS_GENERATION_BATCH_SIZE,
+                    max_wait_ms=settings.POSTS_GENERATION_MAX_WAIT_MS,
+                )
+    return _batcher
+
+
+def generate_text(prompt, **sampling):
+    return get_generation_batcher()((prompt, sampling_key(sampling)))
+
+
+def generate_texts(prompts, **sampling):
+    key = sampling_key(sampling)
+    batch_size = settings.POSTS_GENERATION_BATCH_SIZE
+    texts = []
+    for start in range(0, len(prompts), batch_size):
+        chunk = prompts[start : start + batch_size]
+        texts.extend(generate_batch([(prompt, key) for prompt in chunk]))
+    return texts
+
+
+def _reset_batcher(setting, **kwargs):
+    global _batcher
+    if setting.startswith("POSTS_GENERATION"):
+        _batcher = None
+
+
+setting_changed.connect(_reset_batcher)
@@ -0,0 +1,271 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+
+
+class StubClassifier:
+    toxic_words = {"idiot", "stupid", "hate", "moron", "kill"}
+
+    def score(self, text):
+        words = {word.strip(".,!?").lower() for word in text.split()}
+        return 0.99 if words & self.toxic_words else 0.01
+
+    def __call__(self, inputs, **kwargs):
+        if isinstance(inputs, str):
+            return [{"label": "toxic", "score": self.score(inputs)}]
+        return [{"label": "toxic", "score": self.score(text)} for text in inputs]
+
+
+class StubTextGenerator:
+    reply = "Thanks for sharing your thoughts!"
+
+    def __call__(self, inputs, **kwargs):
+        if isinstance(inputs, str):
+            return [{"generated_text": f"{inputs} {self.reply}"}]
+        return [[{"generated_text": f"{prompt} {self.reply}"}] for prompt in inputs]
+
+
+def configure_generator(generator):
+    # GPT-2 has no pad token; batched prompts are left-padded with EOS.
+    generator.tokenizer.pad_token_id = generator.model.config.eos_token_id
+    generator.tokenizer.padding_side = "left"
+    return generator
+
+
+class TransformersBackend:
+    def classifier(self):
+        from transformers import pipeline
+
+        return pipeline("text-classification", model=settings.POSTS_TOXICITY_MODEL)
+
+    def text_generator(self):
+        from transformers import pipeline
+
+        return configure_generator(
+            pipeline("text-generation", model=settings.POSTS_GENERATION_MODEL)
+        )
+
+
+class QuantizedBackend(TransformersBackend):
+    """The PyTorch pipelines with their Linear layers quantized to int8.
+
+    Dynamic quantization only rewrites torch.nn.Linear. That covers all of
+    toxic-bert, but GPT-2 is built from transformers' Conv1D, so only its LM
+    head shrinks; use the onnx backend to speed up generation.
+    """
+
+    def quantize(self, pipe):
+        import torch
+
+        pipe.model = torch.quantization.quantize_dynamic(
+            pipe.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        return pipe
+
+    def classifier(self):
+        return self.quantize(super().classifier())
+
+    def text_generator(self):
+        return self.quantize(super().text_generator())
+
+
+class ONNXBackend:
+    """Runs both models with ONNX Runtime through optimum.
+
+    The first load exports each model to POSTS_ONNX_DIR; later loads, in any
+    process, reuse the export.
+    """
+
+    def load(self, model_class, model_name):
+        path = Path(settings.POSTS_ONNX_DIR) / model_name.replace("/", "--")
+        if path.exists():
+            return model_class.from_pretrained(path)
+        model = model_class.from_pretrained(model_name, export=True)
+        model.save_pretrained(path)
+        return model
+
+    def optimum(self):
+        try:
+            from optimum import onnxruntime
+        except ImportError:
+            raise ImproperlyConfigured(
+                "The onnx inference backend needs optimum[onnxruntime] installed."
+            )
+        return onnxruntime
+
+    def classifier(self):
+        from transformers import AutoTokenizer, pipeline
+
+        name = settings.POSTS_TOXICITY_MODEL
+        model = self.load(self.optimum().ORTModelForSequenceClassification, name)
+        return pipeline(
+            "text-classification",
+            model=model,
+            tokenizer=AutoTokenizer.from_pretrained(name),
+        )
+
+    def text_generator(self):
+        from transformers import AutoTokenizer, pipeline
+
+        name = settings.POSTS_GENERATION_MODEL
+        model = self.load(self.optimum().ORTModelForCausalLM, name)
+        return configure_generator(
+            pipeline(
+                "text-generation",
+                model=model,
+                tokenizer=AutoTokenizer.from_pretrained(name),
+            )
+        )
+
+
+class SidecarBackend:
+    """Proxies to the models owned by `manage.py run_inference_server`."""
+
+    def classifier(self):
+        return self._remote("classifier")
+
+    def text_generator(self):
+        return self._remote("text_generator")
+
+    def _remote(self, name):
+        from .sidecar import RemoteModel, SidecarClient
+
+        # classifier_id() labels scores with POSTS_SIDECAR_BACKEND, so the
+        # client refuses a server running another backend.
+        client = SidecarClient(
+            settings.POSTS_SIDECAR_SOCKET, backend=settings.POSTS_SIDECAR_BACKEND
+        )
+        return RemoteModel(name, client)
+
+
+class StubBackend:
+    def classifier(self):
+        return StubClassifier()
+
+    def text_generator(self):
+        return StubTextGenerator()
+
+
+BACKENDS = {
+    "transformers": TransformersBackend,
+    "quantized": QuantizedBackend,
+    "onnx": ONNXBackend,
+    "sidecar": SidecarBackend,
+    "stub": StubBackend,
+}
+
+
+def get_backend(name=None):
+    name = name or settings.POSTS_INFERENCE_BACKEND
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown POSTS_INFERENCE_BACKEND {name!r}.")
+
+
+def classifier_id():
+    backend = settings.POSTS_INFERENCE_BACKEND
+    if backend == "sidecar":
+        backend = settings.POSTS_SIDECAR_BACKEND
+    return f"{settings.POSTS_TOXICITY_MODEL}@{backend}"
+
+
+class ModelRegistry:
+    """Loads each model on first use and keeps one instance per process.
+
+    Every model has its own lock, so warming GPT-2 does not hold up
+    moderation requests waiting for toxic-bert.
+    """
+
+    names = ("classifier", "text_generator")
+
+    def __init__(self):
+        self._models = {}
+        self._locks = {name: threading.Lock() for name in self.names}
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                model = getattr(get_backend(), name)()
+                self._models[name] = model
+        return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def is_ready(self, names=None):
+        return all(self.is_loaded(name) for name in names or self.names)
+
+    def warm_up(self, names=None):
+        for name in names or self.names:
+            self.get(name)
+
+    def reset(self):
+        for name in self.names:
+            with self._locks[name]:
+                self._models.pop(name, None)
+
+
+registry = ModelRegistry()
+
+
+def get_classifier():
+    return registry.get("classifier")
+
+
+def get_text_generator():
+    return registry.get("text_generator")
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_inference_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.POSTS_INFERENCE_WORKERS,
+                    thread_name_prefix="inference",
+                )
+    return _executor
+
+
+def _run_in_worker(func, *args, **kwargs):
+    # Pool threads also run ORM code and nothing else closes their
+    # connections, so do it here as the request cycle would.
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_inference(func, *args, **kwargs):
+    """Run blocking model code off the event loop on the bounded executor."""
+    return await sync_to_async(
+        _run_in_worker, thread_sensitive=False, executor=get_inference_executor()
+    )(func, *args, **kwargs)
+
+
+def _reset_registry(setting, **kwargs):
+    if setting.startswith(("POSTS_INFERENCE", "POSTS_SIDECAR")) or setting in (
+        "POSTS_TOXICITY_MODEL",
+        "POSTS_GENERATION_MODEL",
+    ):
+        registry.reset()
+
+
+setting_changed.connect(_reset_registry)
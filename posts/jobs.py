@@ -0,0 +1,120 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AutoReplyJob, Comment
+from .services import generate_reply
+
+
+def schedule_auto_reply(comment, post):
+    return AutoReplyJob.objects.create(
+        comment=comment,
+        run_at=timezone.now() + timedelta(seconds=post.auto_reply_delay),
+    )
+
+
+def schedule_auto_replies(comments):
+    now = timezone.now()
+    return AutoReplyJob.objects.bulk_create(
+        AutoReplyJob(
+            comment=comment,
+            run_at=now + timedelta(seconds=comment.post.auto_reply_delay),
+        )
+        for comment in comments
+    )
+
+
+def release_stale_jobs():
+    stale_before = timezone.now() - timedelta(
+        seconds=settings.POSTS_AUTO_REPLY_STALE_AFTER
+    )
+    return AutoReplyJob.objects.filter(
+        status=AutoReplyJob.RUNNING, locked_at__lt=stale_before
+    ).update(status=AutoReplyJob.PENDING, locked_by="", locked_at=None)
+
+
+def claim_due_jobs(limit):
+    # Claiming is a conditional UPDATE tagged with a fresh token, so several
+    # workers polling the same table never pick up the same job.
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = AutoReplyJob.objects.filter(
+        status=AutoReplyJob.PENDING,
+        run_at__lte=now,
+        comment__post__deleted_at__isnull=True,
+    ).order_by("run_at")
+    ids = list(due.values_list("id", flat=True)[:limit])
+    if not ids:
+        return []
+
+    AutoReplyJob.objects.filter(id__in=ids, status=AutoReplyJob.PENDING).update(
+        status=AutoReplyJob.RUNNING,
+        locked_by=token,
+        locked_at=now,
+        attempts=F("attempts") + 1,
+    )
+    return list(
+        AutoReplyJob.objects.filter(locked_by=token, status=AutoReplyJob.RUNNING)
+        .select_related("comment__post__author")
+        .order_by("run_at")
+    )
+
+
+def complete_job(job, reply):
+    post = job.comment.post
+    with transaction.atomic():
+        Comment.objects.create(post=post, content=reply, author=post.author)
+        AutoReplyJob.objects.filter(id=job.id).update(
+            status=AutoReplyJob.DONE, locked_by="", locked_at=None, last_error=""
+        )
+
+
+def fail_job(job, error):
+    if job.attempts >= settings.POSTS_AUTO_REPLY_MAX_ATTEMPTS:
+        status, run_at = AutoReplyJob.FAILED, job.run_at
+    else:
+        status = AutoReplyJob.PENDING
+        run_at = timezone.now() + timedelta(
+            seconds=settings.POSTS_AUTO_REPLY_RETRY_DELAY * job.attempts
+        )
+    AutoReplyJob.objects.filter(id=job.id).update(
+        status=status,
+        run_at=run_at,
+        locked_by="",
+        locked_at=None,
+        last_error=repr(error),
+    )
+
+
+def run_job(job):
+    try:
+        reply = generate_reply(job.comment.post.content, job.comment.content)
+        complete_job(job, reply)
+    except Exception as exc:
+        fail_job(job, exc)
+
+
+def _run_job_in_worker(job):
+    try:
+        run_job(job)
+    finally:
+        close_old_connections()
+
+
+def process_due_jobs(limit, executor=None):
+    jobs = claim_due_jobs(limit)
+    if executor is None:
+        for job in jobs:
+            run_job(job)
+    else:
+        list(executor.map(_run_job_in_worker, jobs))
+    return len(jobs)
+
+
+def make_executor(workers):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auto-reply")
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Comment
+from posts.stats import apply_comment_count_deltas, apply_comment_deltas
+
+
+def apply_threshold(threshold):
+    """Re-block scored comments against ``threshold`` without running the model.
+
+    Returns ``(blocked, unblocked)`` counts. The rollups move by the grouped
+    counts of the flipped rows, so nothing is loaded row by row.
+    """
+    scored = Comment.objects.filter(toxicity_score__isnull=False)
+    changes = {
+        True: scored.filter(blocked=False, toxicity_score__gt=threshold),
+        False: scored.filter(blocked=True, toxicity_score__lte=threshold),
+    }
+    flipped = {}
+    with transaction.atomic():
+        for blocked, comments in changes.items():
+            sign = 1 if blocked else -1
+            daily = comments.values("created_at__date").annotate(n=Count("id"))
+            per_post = comments.values("post_id").annotate(n=Count("id"))
+            apply_comment_deltas(
+                {day["created_at__date"]: (0, sign * day["n"]) for day in daily}
+            )
+            apply_comment_count_deltas(
+                {
+                    post["post_id"]: (-sign * post["n"], sign * post["n"])
+                    for post in per_post
+                }
+            )
+            flipped[blocked] = comments.update(blocked=blocked)
+    return flipped[True], flipped[False]
+
+
+class Command(BaseCommand):
+    help = (
+        "Block or unblock scored comments against POSTS_TOXICITY_THRESHOLD "
+        "using their stored toxicity scores."
+    )
+
+    def handle(self, *args, **options):
+        threshold = settings.POSTS_TOXICITY_THRESHOLD
+        blocked, unblocked = apply_threshold(threshold)
+        self.stdout.write(
+            f"Threshold {threshold}: blocked {blocked} and unblocked "
+            f"{unblocked} comment(s)."
+        )
@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.inference import BACKENDS, get_backend
+from posts.models import Comment
+from posts.moderation import is_toxic
+from posts.services import build_reply_prompt, extract_reply
+
+SAMPLE_TEXTS = [
+    "Great write-up, thanks for sharing!",
+    "I disagree with the second point, but the rest makes sense.",
+    "Does anyone have a link to the original paper?",
+    "You are an idiot and nobody wants you here.",
+    "This is the stupidest thing I have read all week.",
+    "I hate people like you.",
+    "Meh.",
+    "Could you post the benchmark numbers for the ARM nodes too?",
+]
+
+# Greedy decoding, so both backends should produce the same reply.
+GREEDY = {"max_length": 30, "do_sample": False, "num_return_sequences": 1}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare an inference backend's toxicity scores and replies with the "
+        "reference pipelines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("backend", choices=BACKENDS)
+        parser.add_argument("--reference", choices=BACKENDS, default="transformers")
+        parser.add_argument(
+            "--comments",
+            type=int,
+            default=200,
+            help="Also score this many of the latest stored comments.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.02,
+            help="Largest allowed absolute difference between toxicity scores.",
+        )
+        parser.add_argument(
+            "--min-reply-match",
+            type=float,
+            default=0.8,
+            help="Smallest allowed share of identical greedy replies.",
+        )
+        parser.add_argument("--skip-generation", action="store_true")
+
+    def handle(self, *args, **options):
+        reference = get_backend(options["reference"])
+        candidate = get_backend(options["backend"])
+        texts = SAMPLE_TEXTS + list(
+            Comment.objects.order_by("-id").values_list("content", flat=True)[
+                : options["comments"]
+            ]
+        )
+        failures = []
+
+        expected = self.scores(reference.classifier(), texts)
+        actual = self.scores(candidate.classifier(), texts)
+        diffs = [abs(a - b) for a, b in zip(expected, actual)]
+        flips = sum(is_toxic(a) != is_toxic(b) for a, b in zip(expected, actual))
+        self.stdout.write(
+            f"Classifier: {len(texts)} texts, max diff {max(diffs):.4f}, "
+            f"mean diff {sum(diffs) / len(diffs):.4f}, {flips} verdicts changed"
+        )
+        if max(diffs) > options["tolerance"]:
+            failures.append(f"max score diff {max(diffs):.4f}")
+        if flips:
+            failures.append(f"{flips} toxicity verdicts changed")
+
+        if not options["skip_generation"]:
+            prompts = [
+                build_reply_prompt("Our new CPU nodes are live.", text)
+                for text in texts[: len(SAMPLE_TEXTS)]
+            ]
+            expected = self.replies(reference.text_generator(), prompts)
+            actual = self.replies(candidate.text_generator(), prompts)
+            match = sum(a == b for a, b in zip(expected, actual)) / len(prompts)
+            self.stdout.write(f"Generator: {match:.0%} of greedy replies identical")
+            if match < options["min_reply_match"]:
+                failures.append(f"only {match:.0%} of replies identical")
+
+        if failures:
+            raise CommandError(
+                f"{options['backend']} differs from {options['reference']}: "
+                + "; ".join(failures)
+            )
+        self.stdout.write(f"{options['backend']} matches {options['reference']}.")
+
+    def scores(self, classifier, texts):
+        return [
+            result["score"]
+            for result in classifier(texts, batch_size=16, truncation=True)
+        ]
+
+    def replies(self, generator, prompts):
+        results = generator(prompts, batch_size=len(prompts), **GREEDY)
+        return [extract_reply(result[0]["generated_text"]) for result in results]
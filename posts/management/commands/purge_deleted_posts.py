@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.deletion import deleted_post_ids, purge_post
+
+
+class Command(BaseCommand):
+    help = "Purge soft-deleted posts and their comments in bounded DELETE batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.POSTS_PURGE_BATCH_SIZE,
+            help="Maximum number of comments deleted per transaction.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.POSTS_PURGE_POLL_INTERVAL,
+            help="Seconds to sleep when no post is waiting to be purged.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Purge deleted posts once and exit."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            post_ids = deleted_post_ids()
+            for post_id in post_ids:
+                purged = purge_post(post_id, options["batch_size"])
+                self.stdout.write(f"Purged post {post_id} and {purged} comment(s)")
+            if options["once"]:
+                break
+            if not post_ids:
+                time.sleep(options["poll_interval"])
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from posts.models import Comment
+from posts.stats import comment_date, rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyCommentStats rollup from the comments table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date-from", type=date.fromisoformat)
+        parser.add_argument("--date-to", type=date.fromisoformat)
+
+    def handle(self, *args, **options):
+        bounds = Comment.objects.aggregate(
+            first=Min("created_at"), last=Max("created_at")
+        )
+        if bounds["first"] is None and not (
+            options["date_from"] and options["date_to"]
+        ):
+            self.stdout.write("No comments to aggregate.")
+            return
+
+        date_from = options["date_from"] or comment_date(bounds["first"])
+        date_to = options["date_to"] or comment_date(bounds["last"])
+        if date_from > date_to:
+            raise CommandError("--date-from must be earlier than --date-to.")
+
+        rebuild_daily_stats(date_from, date_to)
+        self.stdout.write(f"Rebuilt daily comment stats from {date_from} to {date_to}")
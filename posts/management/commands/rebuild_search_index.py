@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post and comment search indexes from their tables."
+
+    def handle(self, *args, **options):
+        get_search_backend().rebuild()
+        self.stdout.write("Rebuilt the search indexes.")
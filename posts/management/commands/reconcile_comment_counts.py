@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from posts.models import Post
+from posts.stats import reconcile_comment_counts
+
+
+class Command(BaseCommand):
+    help = "Recount comment_count and blocked_comment_count on posts that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Posts checked per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        last_id = Post.objects.aggregate(last=Max("id"))["last"] or 0
+        batch_size = options["batch_size"]
+        fixed = 0
+        for start in range(0, last_id, batch_size):
+            fixed += len(
+                reconcile_comment_counts(
+                    Post.objects.filter(
+                        id__gt=start, id__lte=start + batch_size
+                    ).values("id")
+                )
+            )
+        self.stdout.write(f"Fixed comment counts on {fixed} posts.")
@@ -0,0 +1,121 @@
+import json
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Mod
+
+from posts.inference import classifier_id
+from posts.models import Comment
+from posts.moderation import PREFILTER_MODEL, is_toxic, moderate_many
+from posts.stats import record_comment_block_changes
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)["last_id"]
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, last_id):
+    with open(f"{path}.tmp", "w") as file:
+        json.dump({"last_id": last_id}, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def rescore_batch(rows, results):
+    """Store new scores for ``(id, post_id, created_at, blocked)`` rows.
+
+    Returns how many comments changed their blocked state.
+    """
+    comments = []
+    flipped = []
+    for (pk, post_id, created_at, blocked), (score, model) in zip(rows, results):
+        toxic = is_toxic(score)
+        comments.append(
+            Comment(id=pk, toxicity_score=score, moderation_model=model, blocked=toxic)
+        )
+        if toxic != blocked:
+            flipped.append((post_id, created_at, toxic))
+
+    # bulk_update skips the model signals, so the rollups are updated here.
+    with transaction.atomic():
+        Comment.objects.bulk_update(
+            comments, ["toxicity_score", "moderation_model", "blocked"]
+        )
+        record_comment_block_changes(flipped)
+    return len(flipped)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-score stored comments with the current moderation model and update "
+        "their blocked flag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.POSTS_REMODERATION_BATCH_SIZE,
+            help="Comments classified and written per batch.",
+        )
+        parser.add_argument(
+            "--shard",
+            type=int,
+            default=0,
+            help="Handle only comments whose id modulo --shards equals this.",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=1,
+            help="Number of processes splitting the work.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the last comment id done, to resume from.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Also re-score comments already scored by the current model.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        shard, shards = options["shard"], options["shards"]
+        if not 0 <= shard < shards:
+            raise CommandError("--shard must be between 0 and --shards - 1.")
+
+        checkpoint = options["checkpoint"]
+        last_id = read_checkpoint(checkpoint) if checkpoint else 0
+
+        comments = Comment.objects.filter(id__gt=last_id).order_by("id")
+        if shards > 1:
+            comments = comments.alias(shard=Mod("id", shards)).filter(shard=shard)
+        if not options["all"]:
+            comments = comments.exclude(
+                moderation_model__in=[classifier_id(), PREFILTER_MODEL]
+            )
+        rows = comments.values_list(
+            "id", "post_id", "created_at", "blocked", "content"
+        ).iterator(chunk_size=batch_size)
+
+        scored = flipped = 0
+        while batch := list(islice(rows, batch_size)):
+            results = moderate_many([row[-1] for row in batch], batch_size=batch_size)
+            flipped += rescore_batch([row[:-1] for row in batch], results)
+            scored += len(batch)
+            last_id = batch[-1][0]
+            if checkpoint:
+                write_checkpoint(checkpoint, last_id)
+            self.stdout.write(f"Scored {scored} comment(s) up to id {last_id}")
+
+        self.stdout.write(
+            f"Re-moderated {scored} comment(s); {flipped} changed blocked state."
+        )
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.jobs import make_executor, process_due_jobs, release_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Run due auto-reply jobs with a bounded pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=settings.POSTS_AUTO_REPLY_WORKERS
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.POSTS_AUTO_REPLY_BATCH_SIZE,
+            help="Maximum number of jobs claimed per poll.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.POSTS_AUTO_REPLY_POLL_INTERVAL,
+            help="Seconds to sleep when no job is due.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Process due jobs once and exit."
+        )
+
+    def handle(self, *args, **options):
+        with make_executor(options["workers"]) as executor:
+            while True:
+                release_stale_jobs()
+                processed = process_due_jobs(options["batch_size"], executor)
+                if processed:
+                    self.stdout.write(f"Processed {processed} auto-reply job(s)")
+                if options["once"]:
+                    break
+                if not processed:
+                    time.sleep(options["poll_interval"])
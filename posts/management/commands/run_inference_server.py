@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.inference import BACKENDS
+from posts.sidecar import InferenceServer
+
+
+class Command(BaseCommand):
+    help = "Serve the inference models to all web workers over a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=settings.POSTS_SIDECAR_SOCKET)
+        parser.add_argument(
+            "--backend",
+            choices=[name for name in BACKENDS if name != "sidecar"],
+            default=settings.POSTS_SIDECAR_BACKEND,
+        )
+
+    def handle(self, *args, **options):
+        server = InferenceServer(options["socket"], options["backend"])
+        started = time.perf_counter()
+        server.load()
+        self.stdout.write(
+            f"Loaded {options['backend']} models in "
+            f"{time.perf_counter() - started:.2f}s, serving on {options['socket']}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.close()
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.inference import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Download and load the inference models, e.g. during a deploy, so the "
+        "weights are cached on disk. This runs in its own process and does not "
+        "warm the web workers; see POSTS_WARM_MODELS_ON_STARTUP for that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names",
+            nargs="*",
+            choices=registry.names,
+            help="Models to load. Defaults to all of them.",
+        )
+
+    def handle(self, *args, **options):
+        for name in options["names"] or registry.names:
+            started = time.perf_counter()
+            registry.get(name)
+            self.stdout.write(f"Loaded {name} in {time.perf_counter() - started:.2f}s")
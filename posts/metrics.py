@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Metrics:
+    """In-process metrics, rendered in the Prometheus text format.
+
+    Each worker process keeps its own numbers; scrape every worker (or run a
+    single worker per pod) to see the whole picture.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+
+    def _histogram(self, name, labels, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(buckets)
+        return histogram
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS, help=""):
+        with self._lock:
+            self._help.setdefault(name, help)
+            self._histogram(name, labels or {}, buckets).observe(value)
+
+    def increment(self, name, value=1, labels=None, help=""):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._help.setdefault(name, help)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def time_inference(self, model, batch_size):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            labels = {"model": model}
+            self.observe(
+                "posts_inference_seconds",
+                time.perf_counter() - started,
+                labels,
+                help="Wall time of one batched model call.",
+            )
+            self.observe(
+                "posts_inference_batch_size",
+                batch_size,
+                labels,
+                buckets=BATCH_BUCKETS,
+                help="Number of inputs per batched model call.",
+            )
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self, samples=()):
+        """Render all metrics plus ``(name, type, help, labels, value)`` samples.
+
+        ``samples`` carries values owned elsewhere, such as queue depth or
+        cache counters, that are read at scrape time.
+        """
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            described = set()
+
+            for (name, labels), histogram in histograms:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} histogram")
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    le = _format_labels(labels + (("le", _format_value(bound)),))
+                    lines.append(f"{name}_bucket{le} {count}")
+                inf = _format_labels(labels + (("le", "+Inf"),))
+                lines.append(f"{name}_bucket{inf} {histogram.total}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.total}")
+
+            for (name, labels), value in counters:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name, kind, help, labels, value in samples:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(
+                f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+metrics = Metrics()
@@ -0,0 +1,142 @@
+import cProfile
+import random
+import re
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import COUNT_BUCKETS, metrics
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+_current_queries = ContextVar("posts_current_queries", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper for every connection; see posts.signals.
+
+    Views may query from other threads (sync_to_async, the inference pool),
+    each with its own connection. The context, and so the request's
+    recorder, is carried into those threads.
+    """
+    queries = _current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Record latency and database usage per endpoint, and sample profiles.
+
+    With POSTS_PROFILE_SAMPLE_RATE above zero, that fraction of requests runs
+    under cProfile and the stats are dumped to POSTS_PROFILE_DIR for
+    inspection with ``python -m pstats`` or snakeviz.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI with async views, stay async so Django does not run every
+        # request in a thread.
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries, profiler = QueryRecorder(), self.sample_profiler()
+        started = time.perf_counter()
+        token = _current_queries.set(queries)
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+
+        if profiler is not None:
+            self.dump_profile(profiler, request)
+        return response
+
+    async def __acall__(self, request):
+        queries, profiler = QueryRecorder(), self.sample_profiler()
+        started = time.perf_counter()
+        token = _current_queries.set(queries)
+        # The profile also covers whatever else the event loop ran meanwhile.
+        if profiler is not None:
+            profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            _current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+
+        if profiler is not None:
+            self.dump_profile(profiler, request)
+        return response
+
+    def sample_profiler(self):
+        if random.random() < settings.POSTS_PROFILE_SAMPLE_RATE:
+            return cProfile.Profile()
+        return None
+
+    def record(self, request, response, elapsed, queries):
+        match = request.resolver_match
+        labels = {
+            "method": request.method,
+            "route": match.route if match else "unmatched",
+        }
+        metrics.observe(
+            "posts_request_seconds",
+            elapsed,
+            labels,
+            help="Request latency by route.",
+        )
+        metrics.increment(
+            "posts_requests_total",
+            labels={**labels, "status": response.status_code},
+            help="Requests by route and status code.",
+        )
+        metrics.observe(
+            "posts_request_db_queries",
+            queries.count,
+            labels,
+            buckets=COUNT_BUCKETS,
+            help="Database queries per request.",
+        )
+        metrics.observe(
+            "posts_request_db_seconds",
+            queries.duration,
+            labels,
+            help="Time spent in database queries per request.",
+        )
+
+    def dump_profile(self, profiler, request):
+        directory = Path(settings.POSTS_PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}.prof"
+        profiler.dump_stats(directory / name)
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0004_alter_comment_created_at_alter_post_created_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ModerationResult",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64)),
+                ("model", models.CharField(max_length=255)),
+                ("score", models.FloatField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("content_hash", "model"),
+                        name="unique_moderation_result",
+                    )
+                ],
+            },
+        ),
+    ]
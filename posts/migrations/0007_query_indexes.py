@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0006_autoreplyjob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("blocked", False)),
+                fields=["post", "created_at", "id"],
+                name="comment_post_visible_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["created_at", "blocked"], name="comment_created_blocked_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["created_at", "id"], name="post_created_idx"),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:28
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_daily_stats(apps, schema_editor):
+    # The same aggregation as posts.stats.rebuild_daily_stats, on the
+    # historical models, so existing comments show up in the breakdown.
+    Comment = apps.get_model("posts", "Comment")
+    DailyCommentStats = apps.get_model("posts", "DailyCommentStats")
+
+    daily_stats = Comment.objects.values("created_at__date").annotate(
+        total_comments=Count("id"),
+        blocked_comments=Count("id", filter=Q(blocked=True)),
+    )
+    DailyCommentStats.objects.bulk_create(
+        DailyCommentStats(
+            date=day["created_at__date"],
+            total_comments=day["total_comments"],
+            blocked_comments=day["blocked_comments"],
+        )
+        for day in daily_stats
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0007_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyCommentStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True)),
+                ("total_comments", models.IntegerField(default=0)),
+                ("blocked_comments", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
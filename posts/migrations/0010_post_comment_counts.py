@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_counts(apps, schema_editor):
+    Comment = apps.get_model("posts", "Comment")
+    Post = apps.get_model("posts", "Post")
+
+    def count(blocked):
+        return Coalesce(
+            Subquery(
+                Comment.objects.filter(post=OuterRef("pk"), blocked=blocked)
+                .order_by()
+                .values("post")
+                .annotate(n=Count("id"))
+                .values("n")
+            ),
+            0,
+        )
+
+    Post.objects.update(comment_count=count(False), blocked_comment_count=count(True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0009_post_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="blocked_comment_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comment_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comment_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:50
+
+from django.db import migrations
+
+# External-content FTS5 indexes over posts and unblocked comments. Triggers
+# keep them in sync with every write, including bulk_create, QuerySet.update()
+# and the raw DELETEs of purge_deleted_posts.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        title, content, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF title, content ON posts_post
+    BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_post_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE posts_comment_fts USING fts5(
+        content, content='posts_comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_comment_fts_insert AFTER INSERT ON posts_comment
+    WHEN NOT new.blocked BEGIN
+        INSERT INTO posts_comment_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_fts_delete AFTER DELETE ON posts_comment
+    WHEN NOT old.blocked BEGIN
+        INSERT INTO posts_comment_fts(posts_comment_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_comment_fts_update AFTER UPDATE OF content, blocked
+    ON posts_comment BEGIN
+        INSERT INTO posts_comment_fts(posts_comment_fts, rowid, content)
+        SELECT 'delete', old.id, old.content WHERE NOT old.blocked;
+        INSERT INTO posts_comment_fts(rowid, content)
+        SELECT new.id, new.content WHERE NOT new.blocked;
+    END
+    """,
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+    """
+    INSERT INTO posts_comment_fts(rowid, content)
+    SELECT id, content FROM posts_comment WHERE NOT blocked
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_insert",
+    "DROP TRIGGER IF EXISTS posts_post_fts_delete",
+    "DROP TRIGGER IF EXISTS posts_post_fts_update",
+    "DROP TRIGGER IF EXISTS posts_comment_fts_insert",
+    "DROP TRIGGER IF EXISTS posts_comment_fts_delete",
+    "DROP TRIGGER IF EXISTS posts_comment_fts_update",
+    "DROP TABLE IF EXISTS posts_post_fts",
+    "DROP TABLE IF EXISTS posts_comment_fts",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "sqlite":
+            for statement in statements:
+                schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0011_post_deleted_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:55
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module("posts.migrations.0012_search_index")
+
+# SQLite may add or drop a column by rebuilding posts_comment, which drops the
+# triggers that keep the comment search index in sync, so they are recreated.
+COMMENT_TRIGGERS = [
+    statement.replace("CREATE TRIGGER", "CREATE TRIGGER IF NOT EXISTS")
+    for statement in search_index.CREATE_SQL
+    if "CREATE TRIGGER posts_comment_fts" in statement
+]
+restore_triggers = search_index.run_on_sqlite(COMMENT_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0012_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name="comment",
+            name="moderation_model",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="toxicity_score",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
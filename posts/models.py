@@ -3,19 +3,46 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 
 
+class LivePostManager(models.Manager):
+    """Hides soft-deleted posts; Post.all_objects still sees them."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Post(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
     auto_reply_enabled = models.BooleanField(
         default=False
     )
     auto_reply_delay = models.PositiveIntegerField(default=5)
+    # Denormalized from Comment by posts.stats; fix drift with
+    # `manage.py reconcile_comment_counts`.
+    comment_count = models.IntegerField(default=0)
+    blocked_comment_count = models.IntegerField(default=0)
+    # Set by delete_post; `manage.py purge_deleted_posts` removes the rows.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LivePostManager()
+    all_objects = models.Manager()
 
     def formatted_date(self):
         return self.created_at.strftime("%m/%d/%Y, %H:%M:%S")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="post_created_idx"),
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="post_deleted_idx",
+            ),
+        ]
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, related_name="comments", on_delete=models.CASCADE)
@@ -23,3 +50,69 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(default=timezone.now)
     blocked = models.BooleanField(default=False)
+    # Null until the comment is scored, e.g. for comments edited with PUT.
+    toxicity_score = models.FloatField(null=True, blank=True)
+    moderation_model = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            # list_comments: unblocked comments of a post in (created_at, id) order.
+            # Partial, because Django compiles blocked=False to "NOT blocked",
+            # which a (post, blocked, ...) index could not seek on.
+            models.Index(
+                fields=["post", "created_at", "id"],
+                condition=models.Q(blocked=False),
+                name="comment_post_visible_idx",
+            ),
+            # comments_daily_breakdown: date range scan counting blocked rows.
+            models.Index(
+                fields=["created_at", "blocked"], name="comment_created_blocked_idx"
+            ),
+        ]
+
+
+class DailyCommentStats(models.Model):
+    date = models.DateField(unique=True)
+    total_comments = models.IntegerField(default=0)
+    blocked_comments = models.IntegerField(default=0)
+
+
+class ModerationResult(models.Model):
+    content_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=255)
+    score = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_hash", "model"], name="unique_moderation_result"
+            )
+        ]
+
+
+class AutoReplyJob(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    comment = models.ForeignKey(
+        Comment, related_name="auto_reply_jobs", on_delete=models.CASCADE
+    )
+    run_at = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"])]
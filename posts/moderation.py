@@ -0,0 +1,225 @@
+import hashlib
+import threading
+import unicodedata
+from collections import Counter
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.signals import setting_changed
+
+from .batching import MicroBatcher
+from .inference import classifier_id, get_classifier
+from .metrics import metrics
+from .models import ModerationResult
+from .prefilter import LexicalPrefilter
+
+
+# Stored as the moderation model of text settled by the lexical pre-filter.
+PREFILTER_MODEL = "prefilter"
+
+
+def is_toxic(score):
+    return score > settings.POSTS_TOXICITY_THRESHOLD
+
+
+def classify_batch(texts):
+    texts = list(texts)
+    with metrics.time_inference("classifier", len(texts)):
+        results = get_classifier()(texts, batch_size=len(texts), truncation=True)
+    return [result["score"] for result in results]
+
+
+_batcher = None
+_lock = threading.Lock()
+
+
+def get_toxicity_batcher():
+    global _batcher
+    if _batcher is None:
+        with _lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    classify_batch,
+                    max_batch_size=settings.POSTS_MODERATION_BATCH_SIZE,
+                    max_wait_ms=settings.POSTS_MODERATION_MAX_WAIT_MS,
+                )
+    return _batcher
+
+
+def content_hash(text):
+    # toxic-bert is uncased, so case and whitespace never change its verdict.
+    normalized = " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class ModerationCache:
+    """Toxicity scores keyed by content hash and classifier.
+
+    Lookups go through an in-process TTL/LRU tier first and fall back to the
+    ModerationResult table, which is shared by every worker.
+    """
+
+    def __init__(self, maxsize, ttl, persist=True):
+        self.persist = persist
+        self.counters = Counter()
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get_many(self, hashes, model):
+        found = {}
+        with self._lock:
+            for digest in hashes:
+                score = self._local.get((digest, model))
+                if score is not None:
+                    found[digest] = score
+            self.counters["local_hits"] += len(found)
+
+        missing = [digest for digest in hashes if digest not in found]
+        if missing and self.persist:
+            stored = dict(
+                ModerationResult.objects.filter(
+                    model=model, content_hash__in=missing
+                ).values_list("content_hash", "score")
+            )
+            with self._lock:
+                for digest, score in stored.items():
+                    self._local[(digest, model)] = score
+                self.counters["db_hits"] += len(stored)
+            found.update(stored)
+
+        with self._lock:
+            self.counters["misses"] += len(hashes) - len(found)
+        return found
+
+    def set_many(self, scores, model):
+        with self._lock:
+            for digest, score in scores.items():
+                self._local[(digest, model)] = score
+        if scores and self.persist:
+            ModerationResult.objects.bulk_create(
+                [
+                    ModerationResult(content_hash=digest, model=model, score=score)
+                    for digest, score in scores.items()
+                ],
+                ignore_conflicts=True,
+            )
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            self.counters.clear()
+
+
+_cache = None
+
+
+def get_moderation_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = ModerationCache(
+                    maxsize=settings.POSTS_MODERATION_CACHE_SIZE,
+                    ttl=settings.POSTS_MODERATION_CACHE_TTL,
+                    persist=settings.POSTS_MODERATION_CACHE_PERSIST,
+                )
+    return _cache
+
+
+_prefilter = None
+
+
+def get_prefilter():
+    global _prefilter
+    if _prefilter is None and settings.POSTS_MODERATION_PREFILTER:
+        with _lock:
+            if _prefilter is None:
+                _prefilter = LexicalPrefilter(
+                    blocklist=settings.POSTS_MODERATION_BLOCKLIST,
+                    allowlist=settings.POSTS_MODERATION_ALLOWLIST,
+                    min_block_matches=settings.POSTS_MODERATION_MIN_BLOCK_MATCHES,
+                    max_clean_words=settings.POSTS_MODERATION_MAX_CLEAN_WORDS,
+                )
+    return _prefilter
+
+
+def _classify(texts, batcher=None, batch_size=None):
+    if batcher is not None:
+        return [batcher(text) for text in texts]
+
+    batch_size = batch_size or settings.POSTS_MODERATION_BATCH_SIZE
+    scores = []
+    for start in range(0, len(texts), batch_size):
+        scores.extend(classify_batch(texts[start : start + batch_size]))
+    return scores
+
+
+def toxicity_score(text):
+    return toxicity_scores([text], batcher=get_toxicity_batcher())[0]
+
+
+def toxicity_scores(texts, batcher=None):
+    return [score for score, _ in moderate_many(texts, batcher)]
+
+
+def moderate(text):
+    """Return ``(score, model)`` for one text, batched with concurrent calls."""
+    return moderate_many([text], batcher=get_toxicity_batcher())[0]
+
+
+def moderate_many(texts, batcher=None, batch_size=None):
+    """Score texts and return a ``(score, model)`` pair for each.
+
+    ``model`` is PREFILTER_MODEL for text the pre-filter settled and the
+    classifier id otherwise, so stored scores can be traced to what made them.
+    """
+    model = classifier_id()
+    prefilter = get_prefilter()
+    if prefilter is None:
+        return [(score, model) for score in _model_scores(texts, batcher, batch_size)]
+
+    results = [(prefilter.score(text), PREFILTER_MODEL) for text in texts]
+    escalated = [index for index, (score, _) in enumerate(results) if score is None]
+    if escalated:
+        model_scores = _model_scores(
+            [texts[index] for index in escalated], batcher, batch_size
+        )
+        for index, score in zip(escalated, model_scores):
+            results[index] = (score, model)
+    return results
+
+
+def _model_scores(texts, batcher=None, batch_size=None):
+    model = classifier_id()
+    cache = get_moderation_cache()
+    hashes = [content_hash(text) for text in texts]
+    scores = cache.get_many(set(hashes), model)
+
+    pending = {}
+    for digest, text in zip(hashes, texts):
+        if digest not in scores:
+            pending.setdefault(digest, text)
+
+    if pending:
+        fresh = dict(
+            zip(pending, _classify(list(pending.values()), batcher, batch_size))
+        )
+        cache.set_many(fresh, model)
+        scores.update(fresh)
+
+    return [scores[digest] for digest in hashes]
+
+
+def _reset_batcher(setting, **kwargs):
+    global _batcher, _cache, _prefilter
+    if setting.startswith("POSTS_MODERATION"):
+        _batcher = None
+        _cache = None
+        _prefilter = None
+
+
+setting_changed.connect(_reset_batcher)
@@ -0,0 +1,57 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+
+
+def page_size(limit):
+    if limit is None:
+        return settings.POSTS_PAGE_SIZE
+    return max(1, min(limit, settings.POSTS_MAX_PAGE_SIZE))
+
+
+def keyset_queryset(queryset, cursor, limit, descending=False):
+    """Slice ``queryset`` to the page after ``cursor`` on (created_at, id).
+
+    One extra row is fetched so the caller can tell whether a next page exists.
+    Raises ValueError for a malformed cursor.
+    """
+    if descending:
+        queryset = queryset.order_by("-created_at", "-id")
+    else:
+        queryset = queryset.order_by("created_at", "id")
+
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        if descending:
+            after = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        else:
+            after = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        queryset = queryset.filter(after)
+
+    return queryset[: limit + 1]
+
+
+def build_page(rows, limit, serialize):
+    """Turn ``.values()`` rows fetched by keyset_queryset into a page dict."""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return {"items": [serialize(row) for row in rows], "next": next_cursor}
@@ -0,0 +1,64 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+TOXIC_SCORE = 1.0
+CLEAN_SCORE = 0.0
+
+# Common digit and symbol swaps used to dodge word filters.
+LEET = str.maketrans(
+    {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"}
+)
+
+
+class LexicalPrefilter:
+    """First moderation tier that settles the obvious cases without the model.
+
+    Text with at least ``min_block_matches`` blocklist hits is toxic. Text of
+    at most ``max_clean_words`` words, all of them allowlisted, or with no
+    letters at all, is clean. ``score`` returns None for everything else, and
+    that text is escalated to the classifier.
+    """
+
+    def __init__(self, blocklist, allowlist, min_block_matches=1, max_clean_words=4):
+        terms = sorted(
+            (
+                r"\s+".join(map(re.escape, term.casefold().split()))
+                for term in blocklist
+            ),
+            key=len,
+            reverse=True,
+        )
+        self.blocklist = re.compile(r"\b(?:%s)\b" % "|".join(terms)) if terms else None
+        self.allowlist = frozenset(word.casefold() for word in allowlist)
+        self.min_block_matches = max(1, min_block_matches)
+        self.max_clean_words = max_clean_words
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def decide(self, text):
+        normalized = unicodedata.normalize("NFKC", text).casefold()
+
+        if self.blocklist is not None:
+            matches = self.blocklist.findall(normalized.translate(LEET))
+            if len(matches) >= self.min_block_matches:
+                return TOXIC_SCORE
+
+        if not any(char.isalpha() for char in normalized):
+            return CLEAN_SCORE
+        words = re.findall(r"[^\W_]+", normalized)
+        if len(words) <= self.max_clean_words and self.allowlist.issuperset(words):
+            return CLEAN_SCORE
+        return None
+
+    def score(self, text):
+        score = self.decide(text)
+        outcome = {TOXIC_SCORE: "toxic", CLEAN_SCORE: "clean", None: "escalated"}
+        with self._lock:
+            self.counters[outcome[score]] += 1
+        return score
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,19 @@
+import orjson
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+# orjson handles dicts, lists and numbers natively; anything else (pydantic
+# schemas, Decimal) falls back to Ninja's encoder. Datetimes go there too, so
+# they keep the format clients already parse: milliseconds and a "Z" suffix.
+_fallback = NinjaJSONEncoder().default
+
+
+def dumps(data):
+    return orjson.dumps(data, default=_fallback, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
@@ -0,0 +1,93 @@
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+from .renderers import dumps
+
+LIST_CHANGED_AT_KEY = "posts:list:changed_at"
+
+
+def post_detail_key(post_id):
+    return f"posts:detail:{post_id}"
+
+
+def post_list_key(cursor, limit):
+    return f"posts:list:{list_changed_at()}:{cursor or ''}:{limit}"
+
+
+def list_changed_at():
+    changed_at = cache.get(LIST_CHANGED_AT_KEY)
+    if changed_at is None:
+        changed_at = int(time.time())
+        cache.add(LIST_CHANGED_AT_KEY, changed_at, timeout=None)
+        changed_at = cache.get(LIST_CHANGED_AT_KEY, changed_at)
+    return changed_at
+
+
+def invalidate_post(post_id=None):
+    invalidate_posts([] if post_id is None else [post_id])
+
+
+def invalidate_posts(post_ids):
+    """Drop cached responses that may contain any of ``post_ids``.
+
+    Every list page can contain any post, so lists are invalidated as a whole
+    by moving the timestamp that their cache keys embed.
+    """
+    cache.delete_many([post_detail_key(post_id) for post_id in post_ids])
+    cache.set(LIST_CHANGED_AT_KEY, max(int(time.time()), list_changed_at() + 1), None)
+
+
+def _render(payload, last_modified):
+    body = dumps(payload)
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    if isinstance(last_modified, datetime):
+        last_modified = last_modified.timestamp()
+    return body, etag, int(last_modified)
+
+
+def _respond(request, body, etag, last_modified):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(",")]
+    else:
+        if_modified_since = parse_http_date_safe(
+            request.headers.get("If-Modified-Since", "")
+        )
+        not_modified = (
+            if_modified_since is not None and last_modified <= if_modified_since
+        )
+
+    response = (
+        HttpResponseNotModified()
+        if not_modified
+        else HttpResponse(body, content_type="application/json; charset=utf-8")
+    )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def cached_response(request, key, build):
+    """Serve a JSON payload from the cache, with ETag and Last-Modified.
+
+    ``build`` returns ``(payload, last_modified)`` and only runs on a miss.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        entry = _render(*build())
+        cache.set(key, entry, settings.POSTS_RESPONSE_CACHE_TTL)
+    return _respond(request, *entry)
+
+
+async def acached_response(request, key, build):
+    entry = await cache.aget(key)
+    if entry is None:
+        entry = _render(*await build())
+        await cache.aset(key, entry, settings.POSTS_RESPONSE_CACHE_TTL)
+    return _respond(request, *entry)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from ninja import Schema
 from datetime import datetime
 from django.core.exceptions import ObjectDoesNotExist
@@ -17,6 +19,8 @@ class PostOutSchema(Schema):
     author: UserOutSchema
     created_at: datetime
     auto_reply_enabled: bool
+    comment_count: int
+    blocked_comment_count: int
 
 
 class PostCreateSchema(Schema):
@@ -35,12 +39,24 @@ class PostCreateSchema(Schema):
         return author_id
 
 
+class PostPatchSchema(Schema):
+    title: Optional[str] = None
+    content: Optional[str] = None
+    author: Optional[int] = None
+    auto_reply_enabled: Optional[bool] = None
+    auto_reply_delay: Optional[int] = None
+
+
 class CommentCreateSchema(Schema):
     post_id: int
     content: str
     author_id: int
 
 
+class CommentPatchSchema(Schema):
+    content: Optional[str] = None
+
+
 class CommentOutSchema(Schema):
     id: int
     content: str
@@ -0,0 +1,120 @@
+import base64
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+
+def encode_search_cursor(score, pk):
+    raw = f"{score!r}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        return float(score), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+
+
+def match_expression(query):
+    """Quote every word, so user input can never be parsed as FTS5 syntax."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"' for word in words)
+
+
+class SQLiteFTSBackend:
+    """Ranked search over the FTS5 indexes created by migration 0012.
+
+    Triggers keep the indexes in sync, so the backend only reads them.
+    Matches come from the inverted index and rows are joined by primary key,
+    so cost grows with the number of hits, not with the size of the tables.
+    """
+
+    # bm25 weights per indexed column: a hit in a post title counts double.
+    queries = {
+        "posts": """
+            SELECT posts_post_fts.rowid AS id, bm25(posts_post_fts, 2.0, 1.0) AS score
+            FROM posts_post_fts
+            JOIN posts_post ON posts_post.id = posts_post_fts.rowid
+            WHERE posts_post_fts MATCH %s AND posts_post.deleted_at IS NULL
+        """,
+        "comments": """
+            SELECT posts_comment_fts.rowid AS id, bm25(posts_comment_fts) AS score
+            FROM posts_comment_fts
+            JOIN posts_comment ON posts_comment.id = posts_comment_fts.rowid
+            JOIN posts_post ON posts_post.id = posts_comment.post_id
+            WHERE posts_comment_fts MATCH %s AND posts_post.deleted_at IS NULL
+        """,
+    }
+
+    def __init__(self):
+        if connection.vendor != "sqlite":
+            raise ImproperlyConfigured(
+                "The sqlite_fts search backend needs the SQLite database backend."
+            )
+
+    def ranked_ids(self, scope, query, after, limit):
+        """Return ``(id, score)`` pairs, best first, after the ``after`` pair."""
+        sql = f"SELECT id, score FROM ({self.queries[scope]}) AS hits"
+        params = [match_expression(query)]
+        if after is not None:
+            score, pk = after
+            sql += " WHERE score > %s OR (score = %s AND id > %s)"
+            params += [score, score, pk]
+        sql += " ORDER BY score, id LIMIT %s"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')"
+            )
+            cursor.execute(
+                "INSERT INTO posts_comment_fts(posts_comment_fts) VALUES ('delete-all')"
+            )
+            cursor.execute(
+                "INSERT INTO posts_comment_fts(rowid, content) "
+                "SELECT id, content FROM posts_comment WHERE NOT blocked"
+            )
+
+
+SEARCH_BACKENDS = {
+    "sqlite_fts": SQLiteFTSBackend,
+}
+
+
+def get_search_backend():
+    try:
+        return SEARCH_BACKENDS[settings.POSTS_SEARCH_BACKEND]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown POSTS_SEARCH_BACKEND {settings.POSTS_SEARCH_BACKEND!r}."
+        )
+
+
+def search_page(scope, query, cursor, limit, rows, serialize):
+    """Run a ranked search and build a ``{"items", "next"}`` page.
+
+    ``rows`` is a ``.values()`` queryset the hits are loaded from and
+    ``serialize`` turns one of its rows into a result item.
+    Raises ValueError for a malformed cursor.
+    """
+    after = decode_search_cursor(cursor) if cursor else None
+    if not match_expression(query):
+        return {"items": [], "next": None}
+
+    hits = get_search_backend().ranked_ids(scope, query, after, limit + 1)
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_search_cursor(hits[-1][1], hits[-1][0])
+
+    found = {row["id"]: row for row in rows.filter(id__in=[pk for pk, _ in hits])}
+    items = [serialize(found[pk]) for pk, _ in hits if pk in found]
+    return {"items": items, "next": next_cursor}
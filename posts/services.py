@@ -1,33 +1,46 @@
+import hashlib
+import heapq
+import threading
+import time
+from collections import Counter
 from datetime import datetime, timedelta
-from django.http import JsonResponse
-from .models import Comment
+from cachetools import LRUCache
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from .metrics import metrics
+from .models import AutoReplyJob, DailyCommentStats
 from .schemas import RegisterUserSchema
 from .models import User
 from django.contrib.auth.hashers import make_password
-from django.db.models import Count, Q
-from transformers import pipeline
 from ninja.security import HttpBearer
 from rest_framework_simplejwt.tokens import AccessToken, Token
+from .generation import generate_text, generate_texts
+from .inference import registry
+from .moderation import (
+    get_moderation_cache,
+    get_prefilter,
+    is_toxic,
+    toxicity_score,
+)
 
 
-classifier = pipeline("text-classification", model="unitary/toxic-bert")
-text_generator = pipeline("text-generation", model="gpt2")
+def build_reply_prompt(post_content, comment_content):
+    return f"Post: {post_content}\nComment: {comment_content}\nReply:"
 
 
-def generate_reply(post_content, comment_content):
-    prompt = f"Post: {post_content}\nComment: {comment_content}\nReply:"
+def generate_reply(post_content, comment_content, **sampling):
+    prompt = build_reply_prompt(post_content, comment_content)
+    return extract_reply(generate_text(prompt, **sampling))
+
+
+def generate_replies(pairs, **sampling):
+    prompts = [build_reply_prompt(post, comment) for post, comment in pairs]
+    return [extract_reply(text) for text in generate_texts(prompts, **sampling)]
 
-    result = text_generator(
-        prompt,
-        max_length=30,
-        num_return_sequences=1,
-        do_sample=True,
-        top_k=50,
-        top_p=0.95,
-        truncation=True,
-    )
 
-    generated_text = result[0]["generated_text"].strip()
+def extract_reply(generated_text):
+    generated_text = generated_text.strip()
 
     reply_start = generated_text.find("Reply:") + len("Reply:")
 
@@ -52,12 +65,7 @@ def generate_reply(post_content, comment_content):
 
 
 def check_for_toxicity(comment):
-    result = classifier(comment)
-    toxicity_score = result[0]["score"]
-
-    if toxicity_score > 0.5:
-        return True
-    return False
+    return is_toxic(toxicity_score(comment))
 
 
 def register_user(request, data: RegisterUserSchema):
@@ -74,13 +82,164 @@ def register_user(request, data: RegisterUserSchema):
     return {"message": "User registered successfully", "user_id": user.id}
 
 
+def readiness(request):
+    models = {name: registry.is_loaded(name) for name in registry.names}
+    ready = registry.is_ready(settings.POSTS_REQUIRED_MODELS)
+    return JsonResponse(
+        {"ready": ready, "models": models}, status=200 if ready else 503
+    )
+
+
+def metrics_view(request):
+    pending = AutoReplyJob.objects.filter(status=AutoReplyJob.PENDING)
+    samples = [
+        (
+            "posts_auto_reply_jobs",
+            "gauge",
+            "Auto-reply jobs waiting to run.",
+            {"state": "pending"},
+            pending.count(),
+        ),
+        (
+            "posts_auto_reply_jobs",
+            "gauge",
+            "Auto-reply jobs waiting to run.",
+            {"state": "due"},
+            pending.filter(run_at__lte=timezone.now()).count(),
+        ),
+    ]
+    for name, value in get_moderation_cache().stats().items():
+        samples.append(
+            (
+                "posts_moderation_cache_lookups_total",
+                "counter",
+                "Moderation cache lookups in this process, by outcome.",
+                {"outcome": name},
+                value,
+            )
+        )
+    prefilter = get_prefilter()
+    for name, value in (prefilter.stats() if prefilter else {}).items():
+        samples.append(
+            (
+                "posts_moderation_prefilter_total",
+                "counter",
+                "Texts the lexical pre-filter decided, or escalated to the model.",
+                {"outcome": name},
+                value,
+            )
+        )
+    for name, value in token_cache.stats().items():
+        samples.append(
+            (
+                "posts_jwt_cache_lookups_total",
+                "counter",
+                "Verified-token cache lookups in this process, by outcome.",
+                {"outcome": name},
+                value,
+            )
+        )
+    return HttpResponse(
+        metrics.render(samples), content_type="text/plain; version=0.0.4"
+    )
+
+
+class VerifiedTokenCache:
+    """Remembers access tokens that passed verification until they expire.
+
+    Entries are keyed by the token's SHA-256 digest so raw tokens are never
+    kept in memory. Verified tokens live in a bounded LRU; revocations are
+    never evicted, only dropped once the token has expired, so a revoked
+    token cannot pass again however many others are revoked.
+    """
+
+    def __init__(self, maxsize):
+        self.counters = Counter()
+        self._verified = LRUCache(maxsize=maxsize)
+        self._revoked = {}
+        self._revocation_expiries = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def is_verified(self, token):
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            expires_at = self._verified.get(key)
+            if expires_at is not None and expires_at <= now:
+                del self._verified[key]
+                expires_at = None
+            self.counters["hits" if expires_at else "misses"] += 1
+            return expires_at is not None
+
+    def is_revoked(self, token):
+        key = self.digest(token)
+        with self._lock:
+            expires_at = self._revoked.get(key)
+            if expires_at is not None and expires_at <= time.time():
+                del self._revoked[key]
+                expires_at = None
+            return expires_at is not None
+
+    def add(self, token, expires_at):
+        with self._lock:
+            self._verified[self.digest(token)] = expires_at
+
+    def revoke(self, token, expires_at=None):
+        key = self.digest(token)
+        with self._lock:
+            expires_at = expires_at or self._verified.get(key) or float("inf")
+            self._verified.pop(key, None)
+            self._revoked[key] = expires_at
+            heapq.heappush(self._revocation_expiries, (expires_at, key))
+            self._forget_expired_revocations(time.time())
+
+    def _forget_expired_revocations(self, now):
+        expiries = self._revocation_expiries
+        while expiries and expiries[0][0] <= now:
+            expires_at, key = heapq.heappop(expiries)
+            if self._revoked.get(key) == expires_at:
+                del self._revoked[key]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+            self._revoked.clear()
+            self._revocation_expiries.clear()
+            self.counters.clear()
+
+
+token_cache = VerifiedTokenCache(maxsize=settings.POSTS_JWT_CACHE_SIZE)
+
+
+def revoke_token(token):
+    """Reject ``token`` until it expires. Only this process's cache is updated."""
+    try:
+        expires_at = AccessToken(token, verify=False)["exp"]
+    except Exception:
+        expires_at = None
+    token_cache.revoke(token, expires_at)
+
+
 class JWTBearer(HttpBearer):
     def authenticate(self, request, token: Token):
-        try:
-            AccessToken(token)
+        if token_cache.is_verified(token):
             return token
+        if token_cache.is_revoked(token):
+            return None
+        try:
+            access_token = AccessToken(token)
         except Exception:
             return None
+        token_cache.add(token, access_token["exp"])
+        return token
 
 
 def comments_daily_breakdown(request, date_from: str, date_to: str):
@@ -97,36 +256,24 @@ def comments_daily_breakdown(request, date_from: str, date_to: str):
             {"error": "'date_from' must be earlier than 'date_to'."}, status=400
         )
 
-    comments = Comment.objects.filter(
-        created_at__date__range=(date_from.date(), date_to.date())
-    )
-
-    daily_stats = comments.values("created_at__date").annotate(
-        total_comments=Count("id"), blocked_comments=Count("id", filter=Q(blocked=True))
-    )
+    daily_stats = {
+        day.date: day
+        for day in DailyCommentStats.objects.filter(
+            date__range=(date_from.date(), date_to.date())
+        )
+    }
 
     result = []
     current_date = date_from.date()
     while current_date <= date_to.date():
-        day_stats = next(
-            (d for d in daily_stats if d["created_at__date"] == current_date), None
+        day_stats = daily_stats.get(current_date)
+        result.append(
+            {
+                "date": current_date.strftime("%Y-%m-%d"),
+                "total_comments": day_stats.total_comments if day_stats else 0,
+                "blocked_comments": day_stats.blocked_comments if day_stats else 0,
+            }
         )
-        if day_stats:
-            result.append(
-                {
-                    "date": current_date.strftime("%Y-%m-%d"),
-                    "total_comments": day_stats["total_comments"],
-                    "blocked_comments": day_stats["blocked_comments"],
-                }
-            )
-        else:
-            result.append(
-                {
-                    "date": current_date.strftime("%Y-%m-%d"),
-                    "total_comments": 0,
-                    "blocked_comments": 0,
-                }
-            )
         current_date += timedelta(days=1)
 
     return JsonResponse({"daily_comments": result}, status=200)
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+from django.conf import settings
+
+from .batching import MicroBatcher
+from .inference import get_backend, registry
+
+
+class SidecarError(RuntimeError):
+    pass
+
+
+def authkey():
+    return hashlib.sha256(f"posts-sidecar:{settings.SECRET_KEY}".encode()).digest()
+
+
+class InferenceServer:
+    """Owns one copy of each model and serves every web worker on the host.
+
+    Calls for the same model and options share a MicroBatcher, so a batch can
+    hold texts sent by different web workers.
+    """
+
+    def __init__(self, address, backend):
+        self.address = address
+        self.backend = backend
+        self.models = {}
+        self._batchers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._closed = threading.Event()
+
+    def load(self):
+        backend = get_backend(self.backend)
+        for name in registry.names:
+            self.models[name] = getattr(backend, name)()
+
+    def batcher(self, name, options):
+        with self._lock:
+            batcher = self._batchers.get((name, options))
+            if batcher is None:
+                model, kwargs = self.models[name], dict(options)
+
+                def handler(inputs):
+                    return model(inputs, batch_size=len(inputs), **kwargs)
+
+                if name == "classifier":
+                    size = settings.POSTS_MODERATION_BATCH_SIZE
+                    wait = settings.POSTS_MODERATION_MAX_WAIT_MS
+                else:
+                    size = settings.POSTS_GENERATION_BATCH_SIZE
+                    wait = settings.POSTS_GENERATION_MAX_WAIT_MS
+                batcher = self._batchers[(name, options)] = MicroBatcher(
+                    handler, max_batch_size=size, max_wait_ms=wait
+                )
+        return batcher
+
+    def call(self, name, inputs, options):
+        options = tuple(sorted(options.items()))
+        futures = [self.batcher(name, options).submit(item) for item in inputs]
+        return [future.result() for future in futures]
+
+    def handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    operation, *args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if operation == "ping":
+                        reply = (
+                            "ok",
+                            {"backend": self.backend, "models": sorted(self.models)},
+                        )
+                    else:
+                        reply = ("ok", self.call(*args))
+                except Exception as exc:
+                    reply = ("error", repr(exc))
+                connection.send(reply)
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, family="AF_UNIX", authkey=authkey()) as listener:
+            self._listener = listener
+            while not self._closed.is_set():
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    continue
+                threading.Thread(
+                    target=self.handle, args=(connection,), daemon=True
+                ).start()
+
+    def close(self):
+        self._closed.set()
+        # accept() does not return when the listener is closed under it, so
+        # wake it up with one last connection.
+        try:
+            Client(self.address, family="AF_UNIX", authkey=authkey()).close()
+        except OSError:
+            pass
+
+
+class SidecarClient:
+    """Talks to the InferenceServer, with one connection per thread.
+
+    With ``backend`` set, every new connection checks that the server runs
+    that backend, since results are stored under its model label.
+    """
+
+    def __init__(self, address, backend=None):
+        self.address = address
+        self.backend = backend
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = Client(self.address, family="AF_UNIX", authkey=authkey())
+            if self.backend is not None:
+                self._check_backend(connection)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _check_backend(self, connection):
+        connection.send(("ping",))
+        _, info = connection.recv()
+        if info["backend"] != self.backend:
+            connection.close()
+            raise SidecarError(
+                f"Inference server at {self.address} runs the {info['backend']!r} "
+                f"backend, but POSTS_SIDECAR_BACKEND is {self.backend!r}."
+            )
+
+    def request(self, *message):
+        # A connection can go stale when the server restarts; model calls are
+        # safe to repeat, so retry once on a fresh one.
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.send(message)
+                status, payload = connection.recv()
+                break
+            except (OSError, EOFError) as exc:
+                self._local.connection = None
+                if attempt:
+                    raise SidecarError(
+                        f"Inference server at {self.address} is unavailable."
+                    ) from exc
+        if status == "error":
+            raise SidecarError(payload)
+        return payload
+
+
+class RemoteModel:
+    """Stands in for a pipeline that lives in the inference server."""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        if name not in client.request("ping")["models"]:
+            raise SidecarError(f"Inference server has no {name} model.")
+
+    def __call__(self, inputs, **kwargs):
+        if isinstance(inputs, str):
+            (result,) = self([inputs], **kwargs)
+            # Pipelines return a bare list of dicts for a single input.
+            return result if isinstance(result, list) else [result]
+        kwargs.pop("batch_size", None)
+        return self.client.request("call", self.name, list(inputs), kwargs)
@@ -0,0 +1,55 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .middleware import record_query
+from .models import Comment
+from .stats import (
+    comment_date,
+    record_comment_counted,
+    record_comment_created,
+    record_comment_deleted,
+)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_previous_comment_state(sender, instance, **kwargs):
+    instance._previous_state = None
+    if not instance._state.adding:
+        instance._previous_state = (
+            Comment.objects.filter(pk=instance.pk)
+            .values_list("post_id", "created_at", "blocked")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_state", None)
+    if created:
+        record_comment_created(instance.created_at, instance.blocked)
+        record_comment_counted(instance.post_id, instance.blocked)
+    elif previous is not None:
+        post_id, created_at, blocked = previous
+        if (comment_date(created_at), blocked) != (
+            comment_date(instance.created_at),
+            instance.blocked,
+        ):
+            record_comment_deleted(created_at, blocked)
+            record_comment_created(instance.created_at, instance.blocked)
+        if (post_id, blocked) != (instance.post_id, instance.blocked):
+            record_comment_counted(post_id, blocked, sign=-1)
+            record_comment_counted(instance.post_id, instance.blocked)
+
+
+@receiver(post_delete, sender=Comment)
+def update_stats_on_delete(sender, instance, **kwargs):
+    record_comment_deleted(instance.created_at, instance.blocked)
+    record_comment_counted(instance.post_id, instance.blocked, sign=-1)
+
+
+@receiver(connection_created)
+def count_request_queries(sender, connection, **kwargs):
+    # Each thread opens its own connection; a reconnect reuses the wrapper list.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Comment, DailyCommentStats, Post
+from .response_cache import invalidate_posts
+
+
+def comment_date(created_at):
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    return timezone.localtime(created_at).date()
+
+
+def apply_comment_deltas(deltas):
+    """Add ``{date: (total, blocked)}`` deltas to the daily rollup rows."""
+    deltas = {date: delta for date, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    DailyCommentStats.objects.bulk_create(
+        [DailyCommentStats(date=date) for date in deltas], ignore_conflicts=True
+    )
+    for date, (total, blocked) in deltas.items():
+        DailyCommentStats.objects.filter(date=date).update(
+            total_comments=F("total_comments") + total,
+            blocked_comments=F("blocked_comments") + blocked,
+        )
+
+
+def comment_deltas(comments, sign=1):
+    """Group ``(created_at, blocked)`` pairs into per-day rollup deltas."""
+    deltas = defaultdict(lambda: [0, 0])
+    for created_at, blocked in comments:
+        delta = deltas[comment_date(created_at)]
+        delta[0] += sign
+        delta[1] += sign if blocked else 0
+    return {date: tuple(delta) for date, delta in deltas.items()}
+
+
+def record_comment_created(created_at, blocked):
+    apply_comment_deltas(comment_deltas([(created_at, blocked)]))
+
+
+def record_comment_deleted(created_at, blocked):
+    apply_comment_deltas(comment_deltas([(created_at, blocked)], sign=-1))
+
+
+def comment_count_deltas(comments, sign=1):
+    """Group ``(post_id, blocked)`` pairs into per-post counter deltas."""
+    deltas = defaultdict(lambda: [0, 0])
+    for post_id, blocked in comments:
+        deltas[post_id][1 if blocked else 0] += sign
+    return {post_id: tuple(delta) for post_id, delta in deltas.items()}
+
+
+def apply_comment_count_deltas(deltas):
+    """Add ``{post_id: (visible, blocked)}`` deltas to the Post counters.
+
+    Posts that need the same delta share one UPDATE. updated_at moves too, so
+    Last-Modified on the post reflects the new counts.
+    """
+    groups = defaultdict(list)
+    for post_id, delta in deltas.items():
+        if any(delta):
+            groups[delta].append(post_id)
+    if not groups:
+        return
+
+    now = timezone.now()
+    for (visible, blocked), post_ids in groups.items():
+        Post.objects.filter(id__in=post_ids).update(
+            comment_count=F("comment_count") + visible,
+            blocked_comment_count=F("blocked_comment_count") + blocked,
+            updated_at=now,
+        )
+    post_ids = [post_id for ids in groups.values() for post_id in ids]
+    transaction.on_commit(lambda: invalidate_posts(post_ids))
+
+
+def record_comment_counted(post_id, blocked, sign=1):
+    apply_comment_count_deltas(comment_count_deltas([(post_id, blocked)], sign))
+
+
+def record_comment_block_change(post_id, created_at, blocked):
+    """Move one comment between the visible and blocked counts."""
+    record_comment_block_changes([(post_id, created_at, blocked)])
+
+
+def record_comment_block_changes(comments):
+    """Move ``(post_id, created_at, blocked)`` comments to their new blocked state."""
+    daily = defaultdict(int)
+    counts = defaultdict(int)
+    for post_id, created_at, blocked in comments:
+        sign = 1 if blocked else -1
+        daily[comment_date(created_at)] += sign
+        counts[post_id] += sign
+    apply_comment_deltas({date: (0, delta) for date, delta in daily.items()})
+    apply_comment_count_deltas(
+        {post_id: (-delta, delta) for post_id, delta in counts.items()}
+    )
+
+
+def created_between(queryset, date_from=None, date_to=None):
+    # A plain range on created_at can use the created_at indexes;
+    # filtering on created_at__date would wrap the column in a function.
+    if date_from is not None:
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        queryset = queryset.filter(created_at__gte=start)
+    if date_to is not None:
+        end = date_to + timedelta(days=1)
+        queryset = queryset.filter(
+            created_at__lt=timezone.make_aware(datetime.combine(end, time.min))
+        )
+    return queryset
+
+
+def daily_breakdown_queryset(date_from, date_to):
+    return created_between(Comment.objects.all(), date_from, date_to)
+
+
+def rebuild_daily_stats(date_from, date_to):
+    daily_stats = (
+        daily_breakdown_queryset(date_from, date_to)
+        .values("created_at__date")
+        .annotate(
+            total_comments=Count("id"),
+            blocked_comments=Count("id", filter=Q(blocked=True)),
+        )
+    )
+    with transaction.atomic():
+        DailyCommentStats.objects.filter(date__range=(date_from, date_to)).delete()
+        DailyCommentStats.objects.bulk_create(
+            DailyCommentStats(
+                date=day["created_at__date"],
+                total_comments=day["total_comments"],
+                blocked_comments=day["blocked_comments"],
+            )
+            for day in daily_stats
+        )
+
+
+def counted_comments(blocked):
+    """Per-post comment count as a subquery, for annotating Post querysets."""
+    return Coalesce(
+        Subquery(
+            Comment.objects.filter(post=OuterRef("pk"), blocked=blocked)
+            .order_by()
+            .values("post")
+            .annotate(n=Count("id"))
+            .values("n")
+        ),
+        0,
+    )
+
+
+def reconcile_comment_counts(post_ids=None):
+    """Recount comments for drifted posts and return the ids that were fixed."""
+    posts = (
+        Post.objects.all() if post_ids is None else Post.objects.filter(id__in=post_ids)
+    )
+    drifted = list(
+        posts.annotate(visible=counted_comments(False), blocked=counted_comments(True))
+        .exclude(comment_count=F("visible"), blocked_comment_count=F("blocked"))
+        .values_list("id", flat=True)
+    )
+    if drifted:
+        with transaction.atomic():
+            Post.objects.filter(id__in=drifted).update(
+                comment_count=counted_comments(False),
+                blocked_comment_count=counted_comments(True),
+                updated_at=timezone.now(),
+            )
+            transaction.on_commit(lambda: invalidate_posts(drifted))
+    return drifted
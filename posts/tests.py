@@ -1,11 +1,77 @@
+import json
+import tempfile
+import threading
+import time
 from datetime import datetime, timedelta
-from django.test import TestCase
-from ninja.testing import TestClient
-from rest_framework_simplejwt.tokens import RefreshToken
-from .urls import post_router, analytics_router
-from .models import User, Post, Comment
+from io import StringIO
+from pathlib import Path
+from urllib.parse import urlencode
+from unittest import mock
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db.models import Count, Q
+from django.db import connection
+from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ninja import Router
+from ninja.testing import TestAsyncClient, TestClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from . import async_views
+from .urls import post_router, comment_router, analytics_router, search_router
+from .models import (
+    User,
+    Post,
+    Comment,
+    ModerationResult,
+    AutoReplyJob,
+    DailyCommentStats,
+)
+from .deletion import purge_comment_batch
+from .admission import EndpointLimiter, Overloaded, get_limiter
+from .jobs import claim_due_jobs, process_due_jobs
+from .metrics import metrics
+from .middleware import MetricsMiddleware
+from .generation import generate_batch, sampling_key
+from .inference import (
+    BACKENDS,
+    registry,
+    run_inference,
+    StubBackend,
+    StubClassifier,
+    StubTextGenerator,
+)
+from .batching import MicroBatcher
+from .checks import check_shared_cache
+from .moderation import (
+    content_hash,
+    get_moderation_cache,
+    get_prefilter,
+    toxicity_scores,
+)
+from .pagination import keyset_queryset
+from .renderers import ORJSONRenderer
+from .schemas import UserOutSchema
+from .services import (
+    JWTBearer,
+    VerifiedTokenCache,
+    check_for_toxicity,
+    generate_replies,
+    revoke_token,
+    token_cache,
+)
+from .sidecar import InferenceServer, RemoteModel, SidecarClient, SidecarError
+from .stats import daily_breakdown_queryset, rebuild_daily_stats
 
+# Query-count tests count the app's queries, not the database cache's.
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
 class PostCreateTest(TestCase):
     def setUp(self):
         self.client = TestClient(post_router)
@@ -82,3 +148,1172 @@ class CommentsAnalyticsTest(TestCase):
         self.assertEqual(daily_comments[1]["date"], date_to.isoformat())
         self.assertEqual(daily_comments[1]["total_comments"], 1)
         self.assertEqual(daily_comments[1]["blocked_comments"], 1)
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
+class ModelRegistryTest(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def test_models_load_on_first_use(self):
+        self.assertFalse(registry.is_loaded("classifier"))
+
+        self.assertTrue(check_for_toxicity("You are an idiot"))
+        self.assertFalse(check_for_toxicity("Nice post"))
+
+        self.assertIsInstance(registry.get("classifier"), StubClassifier)
+        self.assertFalse(registry.is_loaded("text_generator"))
+
+    def test_warm_up_loads_every_model(self):
+        registry.warm_up()
+        self.assertTrue(registry.is_ready())
+
+    def test_readiness_waits_only_for_required_models(self):
+        self.assertEqual(Client().get("/api/health/ready").status_code, 503)
+
+        registry.get("classifier")
+
+        response = Client().get("/api/health/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["models"]["text_generator"])
+
+
+class InferenceParityTest(TestCase):
+    def test_identical_backends_pass(self):
+        out = StringIO()
+        call_command("check_inference_parity", "stub", reference="stub", stdout=out)
+        self.assertIn("stub matches stub", out.getvalue())
+
+    def test_changed_verdicts_fail(self):
+        class LenientClassifier(StubClassifier):
+            toxic_words = set()
+
+        class LenientBackend(StubBackend):
+            def classifier(self):
+                return LenientClassifier()
+
+        with mock.patch.dict(BACKENDS, {"lenient": LenientBackend}):
+            with self.assertRaisesMessage(CommandError, "verdicts changed"):
+                call_command(
+                    "check_inference_parity",
+                    "lenient",
+                    reference="stub",
+                    stdout=StringIO(),
+                )
+
+
+class InferenceSidecarTest(TestCase):
+    def setUp(self):
+        self.socket = Path(tempfile.mkdtemp()) / "inference.sock"
+        self.server = InferenceServer(str(self.socket), "stub")
+        self.server.load()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        while not self.socket.exists():
+            time.sleep(0.01)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.server.close)
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_workers_use_the_server_models(self):
+        with override_settings(
+            POSTS_INFERENCE_BACKEND="sidecar",
+            POSTS_SIDECAR_SOCKET=str(self.socket),
+            POSTS_SIDECAR_BACKEND="stub",
+        ):
+            classifier = registry.get("classifier")
+            self.assertIsInstance(classifier, RemoteModel)
+            self.assertEqual(classifier(["You are an idiot"])[0]["score"], 0.99)
+            self.assertTrue(check_for_toxicity("You are an idiot"))
+            self.assertFalse(check_for_toxicity("Nice post"))
+            self.assertEqual(
+                generate_replies([("Post", "Comment")]),
+                ["Thanks for sharing your thoughts!"],
+            )
+
+    def test_workers_refuse_a_server_running_another_backend(self):
+        with override_settings(
+            POSTS_INFERENCE_BACKEND="sidecar",
+            POSTS_SIDECAR_SOCKET=str(self.socket),
+            POSTS_SIDECAR_BACKEND="onnx",
+        ):
+            with self.assertRaisesMessage(SidecarError, "'stub' backend"):
+                registry.get("classifier")
+
+    def test_unreachable_server_raises(self):
+        client = SidecarClient(str(self.socket) + ".missing")
+        with self.assertRaises(SidecarError):
+            client.request("ping")
+
+
+class MicroBatcherTest(TestCase):
+    def test_concurrent_calls_share_a_batch(self):
+        batches = []
+        release = threading.Event()
+
+        def handler(items):
+            release.wait()
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=50)
+        first = batcher.submit(0)
+        futures = [batcher.submit(i) for i in range(1, 9)]
+        release.set()
+
+        self.assertEqual(first.result(timeout=5), 0)
+        self.assertEqual([f.result(timeout=5) for f in futures], list(range(2, 18, 2)))
+        self.assertLess(len(batches), 9)
+        self.assertTrue(all(len(batch) <= 8 for batch in batches))
+
+    def test_handler_errors_reach_every_caller(self):
+        def handler(items):
+            raise RuntimeError("model crashed")
+
+        batcher = MicroBatcher(handler, max_batch_size=4, max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher(1)
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub", POSTS_MODERATION_PREFILTER=False)
+class ModerationCacheTest(TestCase):
+    def setUp(self):
+        get_moderation_cache().clear()
+
+    def test_normalized_duplicates_are_classified_once(self):
+        self.assertEqual(content_hash("Buy  NOW"), content_hash("buy now "))
+
+        scores = toxicity_scores(["You idiot", "you   IDIOT", "Nice post"])
+
+        self.assertEqual(scores[0], scores[1])
+        self.assertEqual(ModerationResult.objects.count(), 2)
+        self.assertEqual(get_moderation_cache().stats()["misses"], 2)
+
+    def test_scores_survive_a_cleared_local_tier(self):
+        toxicity_scores(["Nice post"])
+        get_moderation_cache().clear()
+
+        toxicity_scores(["Nice post"])
+
+        self.assertEqual(
+            get_moderation_cache().stats(), {"local_hits": 0, "db_hits": 1, "misses": 0}
+        )
+        self.assertEqual(ModerationResult.objects.count(), 1)
+
+
+@override_settings(
+    POSTS_INFERENCE_BACKEND="stub",
+    POSTS_MODERATION_BLOCKLIST=["you idiot", "kys"],
+    POSTS_MODERATION_ALLOWLIST=["great", "post", "thanks"],
+)
+class LexicalPrefilterTest(TestCase):
+    def setUp(self):
+        get_moderation_cache().clear()
+
+    def test_obvious_cases_skip_the_model(self):
+        with mock.patch("posts.moderation.classify_batch") as classify:
+            scores = toxicity_scores(["You  1DIOT!", "Great post, thanks!", "👍 +1"])
+
+        classify.assert_not_called()
+        self.assertEqual(scores, [1.0, 0.0, 0.0])
+        self.assertEqual(get_prefilter().stats(), {"toxic": 1, "clean": 2})
+
+    def test_ambiguous_text_is_escalated(self):
+        scores = toxicity_scores(["I hate this", "Great post", "Thanks, moron"])
+
+        self.assertEqual(scores, [0.99, 0.0, 0.99])
+        self.assertEqual(get_prefilter().stats(), {"clean": 1, "escalated": 2})
+        self.assertEqual(get_moderation_cache().stats()["misses"], 2)
+
+    @override_settings(POSTS_MODERATION_MIN_BLOCK_MATCHES=2)
+    def test_block_threshold(self):
+        self.assertIsNone(get_prefilter().decide("you idiot, please stop"))
+        self.assertEqual(get_prefilter().decide("you idiot. kys"), 1.0)
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
+class AutoReplyJobTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post",
+            content="Test Content",
+            author=self.user,
+            auto_reply_enabled=True,
+            auto_reply_delay=0,
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def test_create_comment_schedules_a_reply(self):
+        client = TestClient(comment_router)
+        response = client.post(
+            "/create",
+            json={
+                "post_id": self.post.id,
+                "content": "Nice!",
+                "author_id": self.user.id,
+            },
+            headers=self.auth_headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AutoReplyJob.objects.get().status, AutoReplyJob.PENDING)
+
+        self.assertEqual(process_due_jobs(limit=10), 1)
+
+        job = AutoReplyJob.objects.get()
+        self.assertEqual(job.status, AutoReplyJob.DONE)
+        self.assertEqual(job.attempts, 1)
+        reply = Comment.objects.exclude(id=job.comment_id).get()
+        self.assertEqual(reply.author, self.user)
+        self.assertEqual(reply.content, "Thanks for sharing your thoughts!")
+
+    def test_jobs_are_claimed_once_and_only_when_due(self):
+        comment = Comment.objects.create(
+            post=self.post, content="Nice!", author=self.user
+        )
+        AutoReplyJob.objects.create(
+            comment=comment, run_at=timezone.now() + timedelta(minutes=5)
+        )
+        due = AutoReplyJob.objects.create(comment=comment, run_at=timezone.now())
+
+        self.assertEqual([job.id for job in claim_due_jobs(10)], [due.id])
+        self.assertEqual(claim_due_jobs(10), [])
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub", POSTS_GENERATION_BATCH_SIZE=2)
+class ReplyGenerationTest(TestCase):
+    def test_replies_are_post_processed_per_prompt(self):
+        replies = generate_replies([("Post A", "First"), ("Post B", "Second")] * 2)
+        self.assertEqual(replies, ["Thanks for sharing your thoughts!"] * 4)
+
+    def test_prompts_are_grouped_by_sampling_params(self):
+        generator = mock.Mock(wraps=StubTextGenerator())
+        greedy = sampling_key({"do_sample": False})
+        items = [("a", sampling_key({})), ("b", greedy), ("c", sampling_key({}))]
+
+        with mock.patch("posts.generation.get_text_generator", return_value=generator):
+            texts = generate_batch(items)
+
+        self.assertEqual(generator.call_count, 2)
+        self.assertEqual(generator.call_args_list[0].args[0], ["a", "c"])
+        self.assertEqual(generator.call_args_list[1].kwargs["do_sample"], False)
+        self.assertTrue(texts[1].startswith("b "))
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub", POSTS_MODERATION_CACHE_PERSIST=False)
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        router = Router()
+        router.add_api_operation(
+            "/create", methods=["POST"], view_func=async_views.create_comment
+        )
+        router.add_api_operation(
+            "/{post_id}/comments", methods=["GET"], view_func=async_views.list_comments
+        )
+        self.client = TestAsyncClient(router)
+
+    async def test_blocked_comments_are_hidden(self):
+        for content in ["Great post", "You idiot"]:
+            response = await self.client.post(
+                "/create",
+                json={
+                    "post_id": self.post.id,
+                    "content": content,
+                    "author_id": self.user.id,
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+
+        response = await self.client.get(f"/{self.post.id}/comments")
+
+        self.assertEqual(
+            [comment["content"] for comment in response.json()["items"]],
+            ["Great post"],
+        )
+        self.assertEqual(await Comment.objects.filter(blocked=True).acount(), 1)
+
+    async def test_inference_threads_close_their_connections(self):
+        with mock.patch("posts.inference.close_old_connections") as close:
+            result = await run_inference(threading.current_thread)
+
+        self.assertNotEqual(result, threading.current_thread())
+        close.assert_called_once_with()
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        created_at = timezone.now()
+        for i in range(5):
+            Comment.objects.create(
+                post=self.post,
+                content=f"Comment {i}",
+                author=self.user,
+                created_at=created_at if i < 3 else created_at + timedelta(seconds=i),
+            )
+        self.client = TestClient(post_router)
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+        cache.clear()
+
+    def test_pages_follow_the_next_cursor(self):
+        contents, cursor = [], ""
+        while True:
+            response = self.client.get(
+                f"/{self.post.id}/comments?limit=2&cursor={cursor}",
+                headers=self.auth_headers,
+            )
+            page = response.json()
+            self.assertLessEqual(len(page["items"]), 2)
+            contents += [comment["content"] for comment in page["items"]]
+            if page["next"] is None:
+                break
+            cursor = page["next"]
+
+        self.assertEqual(contents, [f"Comment {i}" for i in range(5)])
+
+    def test_posts_are_listed_newest_first(self):
+        Post.objects.create(title="Newer", content="Content", author=self.user)
+
+        response = self.client.get("/?limit=1", headers=self.auth_headers)
+
+        self.assertEqual(response.json()["items"][0]["title"], "Newer")
+        self.assertIsNotNone(response.json()["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            f"/{self.post.id}/comments?cursor=bogus", headers=self.auth_headers
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryIndexTest(TestCase):
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_list_comments_uses_post_visible_index(self):
+        queryset = keyset_queryset(
+            Comment.objects.filter(post_id=1, blocked=False), "", 50
+        )
+        self.assertUsesIndex(queryset, "comment_post_visible_idx")
+
+    def test_list_posts_uses_created_index(self):
+        queryset = keyset_queryset(Post.objects.all(), "", 50, descending=True)
+        self.assertUsesIndex(queryset, "post_created_idx")
+
+    def test_daily_breakdown_uses_created_blocked_index(self):
+        today = timezone.now().date()
+        queryset = daily_breakdown_queryset(today - timedelta(days=30), today)
+        self.assertUsesIndex(
+            queryset.values("created_at__date").annotate(
+                total_comments=Count("id"),
+                blocked_comments=Count("id", filter=Q(blocked=True)),
+            ),
+            "comment_created_blocked_idx",
+        )
+
+
+class DailyCommentStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        self.today = timezone.localdate()
+
+    def stats(self):
+        day = DailyCommentStats.objects.get(date=self.today)
+        return day.total_comments, day.blocked_comments
+
+    def test_rollup_follows_create_block_and_delete(self):
+        comment = Comment.objects.create(
+            post=self.post, content="First", author=self.user
+        )
+        Comment.objects.create(
+            post=self.post, content="Second", author=self.user, blocked=True
+        )
+        self.assertEqual(self.stats(), (2, 1))
+
+        comment.blocked = True
+        comment.save()
+        self.assertEqual(self.stats(), (2, 2))
+
+        comment.delete()
+        self.assertEqual(self.stats(), (1, 1))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for blocked in (False, True, False):
+            Comment.objects.create(
+                post=self.post, content="Text", author=self.user, blocked=blocked
+            )
+        DailyCommentStats.objects.update(total_comments=0, blocked_comments=0)
+
+        rebuild_daily_stats(self.today, self.today)
+
+        self.assertEqual(self.stats(), (3, 1))
+
+
+class JWTBearerCacheTest(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_token_is_verified_once(self):
+        bearer = JWTBearer()
+        with mock.patch(
+            "posts.services.AccessToken", wraps=AccessToken
+        ) as access_token:
+            self.assertEqual(bearer.authenticate(None, self.token), self.token)
+            self.assertEqual(bearer.authenticate(None, self.token), self.token)
+
+        self.assertEqual(access_token.call_count, 1)
+        self.assertEqual(token_cache.stats(), {"misses": 1, "hits": 1})
+
+    def test_expired_and_revoked_tokens_are_rejected(self):
+        bearer = JWTBearer()
+        token_cache.add(self.token, time.time() - 1)
+        self.assertFalse(token_cache.is_verified(self.token))
+
+        self.assertEqual(bearer.authenticate(None, self.token), self.token)
+        revoke_token(self.token)
+        self.assertIsNone(bearer.authenticate(None, self.token))
+
+    def test_revocations_are_not_evicted(self):
+        tokens = VerifiedTokenCache(maxsize=2)
+        tokens.revoke("first", time.time() + 60)
+        for n in range(5):
+            tokens.revoke(f"other-{n}", time.time() + 60)
+        tokens.revoke("expired", time.time() - 1)
+
+        self.assertTrue(tokens.is_revoked("first"))
+        self.assertFalse(tokens.is_revoked("expired"))
+
+
+class PostResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        self.client = TestClient(post_router)
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def test_cached_detail_skips_the_database(self):
+        first = self.client.get(f"/{self.post.id}/", headers=self.auth_headers)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(f"/{self.post.id}/", headers=self.auth_headers)
+
+        # Only the read from the database cache table.
+        self.assertEqual(len(queries), 1)
+        self.assertIn("posts_response_cache", queries[0]["sql"])
+
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertTrue(first.has_header("Last-Modified"))
+
+    def test_conditional_get_returns_304(self):
+        etag = self.client.get("/", headers=self.auth_headers)["ETag"]
+
+        response = self.client.get(
+            "/", headers={**self.auth_headers, "If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(POSTS_INFERENCE_BACKEND="stub")
+    def test_writes_invalidate_cached_responses(self):
+        detail = self.client.get(f"/{self.post.id}/", headers=self.auth_headers)
+        listing = self.client.get("/", headers=self.auth_headers)
+
+        self.client.put(
+            f"/{self.post.id}/",
+            json={
+                "title": "Edited",
+                "content": "Test Content",
+                "author": self.user.id,
+                "auto_reply_enabled": False,
+                "auto_reply_delay": 5,
+            },
+            headers=self.auth_headers,
+        )
+
+        response = self.client.get(
+            f"/{self.post.id}/",
+            headers={**self.auth_headers, "If-None-Match": detail["ETag"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Edited")
+        response = self.client.get("/", headers=self.auth_headers)
+        self.assertNotEqual(response["ETag"], listing["ETag"])
+
+    def test_process_local_cache_fails_the_system_check(self):
+        with override_settings(CACHES=LOCAL_CACHES):
+            errors = check_shared_cache(None)
+
+        self.assertEqual([error.id for error in errors], ["posts.E001"])
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class ORJSONRendererTest(TestCase):
+    def test_renders_rows_and_schemas(self):
+        created_at = datetime.fromisoformat("2026-10-18T10:00:00.123456+00:00")
+        body = ORJSONRenderer().render(
+            None,
+            {
+                "items": [{"id": 1, "created_at": created_at}],
+                "author": UserOutSchema(id=1, username="testuser"),
+            },
+            response_status=200,
+        )
+
+        self.assertEqual(
+            json.loads(body),
+            {
+                "items": [{"id": 1, "created_at": "2026-10-18T10:00:00.123Z"}],
+                "author": {"id": 1, "username": "testuser"},
+            },
+        )
+
+
+class NDJSONExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        Comment.objects.create(
+            post=self.post,
+            content="Old",
+            author=self.user,
+            created_at=timezone.now() - timedelta(days=3),
+        )
+        Comment.objects.create(
+            post=self.post, content="New", author=self.user, blocked=True
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def read_lines(self, response):
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.content.splitlines()]
+
+    def test_export_post_comments(self):
+        response = TestClient(post_router).get(
+            f"/{self.post.id}/comments/export", headers=self.auth_headers
+        )
+
+        rows = self.read_lines(response)
+        self.assertEqual([row["content"] for row in rows], ["Old", "New"])
+        self.assertEqual(rows[1]["blocked"], True)
+        self.assertEqual(rows[0]["author"]["username"], "testuser")
+
+    def test_export_comments_by_date(self):
+        today = timezone.localdate().isoformat()
+        response = TestClient(comment_router).get(
+            f"/export?date_from={today}", headers=self.auth_headers
+        )
+
+        self.assertEqual([row["content"] for row in self.read_lines(response)], ["New"])
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
+class BulkCommentIngestionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post",
+            content="Test Content",
+            author=self.user,
+            auto_reply_enabled=True,
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def test_bulk_create_reports_each_item(self):
+        items = [
+            {"post_id": self.post.id, "content": "Great", "author_id": self.user.id},
+            {
+                "post_id": self.post.id,
+                "content": "You idiot",
+                "author_id": self.user.id,
+            },
+            {"post_id": 999, "content": "Lost", "author_id": self.user.id},
+            {"post_id": self.post.id, "content": "Orphan", "author_id": 999},
+        ]
+
+        response = TestClient(comment_router).post(
+            "/bulk", json=items, headers=self.auth_headers
+        )
+
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["accepted", "blocked", "error", "error"],
+        )
+        accepted = Comment.objects.get(id=results[0]["id"])
+        self.assertEqual(accepted.content, "Great")
+        self.assertTrue(Comment.objects.get(id=results[1]["id"]).blocked)
+        self.assertEqual(
+            list(AutoReplyJob.objects.values_list("comment_id", flat=True)),
+            [accepted.id],
+        )
+        stats = DailyCommentStats.objects.get()
+        self.assertEqual((stats.total_comments, stats.blocked_comments), (2, 1))
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub", CACHES=LOCAL_CACHES)
+class CommentCountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def counts(self):
+        self.post.refresh_from_db()
+        return self.post.comment_count, self.post.blocked_comment_count
+
+    def test_counters_follow_comment_changes(self):
+        comment = Comment.objects.create(post=self.post, content="Hi", author=self.user)
+        Comment.objects.create(
+            post=self.post, content="Spam", author=self.user, blocked=True
+        )
+        self.assertEqual(self.counts(), (1, 1))
+
+        comment.blocked = True
+        comment.save()
+        self.assertEqual(self.counts(), (0, 2))
+
+        comment.delete()
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_put_keeps_concurrent_counter_updates(self):
+        def get_then_comment(model, **kwargs):
+            found = get_object_or_404(model, **kwargs)
+            if model is Post:
+                Comment.objects.create(post=self.post, content="Hi", author=self.user)
+            return found
+
+        with mock.patch("posts.views.get_object_or_404", get_then_comment):
+            TestClient(post_router).put(
+                f"/{self.post.id}/",
+                json={
+                    "title": "New title",
+                    "content": "Test Content",
+                    "author": self.user.id,
+                    "auto_reply_enabled": False,
+                    "auto_reply_delay": 5,
+                },
+                headers=self.auth_headers,
+            )
+
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertEqual(self.post.title, "New title")
+
+    def test_bulk_ingestion_updates_counters(self):
+        items = [
+            {"post_id": self.post.id, "content": "Great", "author_id": self.user.id},
+            {"post_id": self.post.id, "content": "Thanks", "author_id": self.user.id},
+            {
+                "post_id": self.post.id,
+                "content": "You idiot",
+                "author_id": self.user.id,
+            },
+        ]
+        TestClient(comment_router).post("/bulk", json=items, headers=self.auth_headers)
+        self.assertEqual(self.counts(), (2, 1))
+
+    def test_list_returns_counts_and_sees_new_comments(self):
+        client = TestClient(post_router)
+        client.get("/", headers=self.auth_headers)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, content="Hi", author=self.user)
+        with self.assertNumQueries(1):
+            item = client.get("/", headers=self.auth_headers).json()["items"][0]
+
+        self.assertEqual((item["comment_count"], item["blocked_comment_count"]), (1, 0))
+
+    def test_reconcile_fixes_drift(self):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, content="Hi", author=self.user) for _ in range(3)
+        )
+        Post.objects.filter(id=self.post.id).update(blocked_comment_count=5)
+
+        out = StringIO()
+        call_command("reconcile_comment_counts", stdout=out)
+
+        self.assertEqual(self.counts(), (3, 0))
+        self.assertIn("Fixed comment counts on 1 posts", out.getvalue())
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub", CACHES=LOCAL_CACHES)
+class PatchEndpointsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        self.comment = Comment.objects.create(
+            post=self.post, content="Hi", author=self.user
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def patch(self, router, path, payload):
+        return TestClient(router).patch(path, json=payload, headers=self.auth_headers)
+
+    def test_patch_post_moderates_only_changed_text(self):
+        with mock.patch(
+            "posts.views.check_for_toxicity", return_value=False
+        ) as check, CaptureQueriesContext(connection) as queries:
+            response = self.patch(
+                post_router,
+                f"/{self.post.id}/",
+                {"title": "New title", "content": "Test Content"},
+            )
+
+        self.assertEqual(response.json()["message"], "Post updated successfully")
+        check.assert_called_once_with("New title")
+        self.assertEqual(
+            [query["sql"].split()[0] for query in queries], ["SELECT", "UPDATE"]
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.title, self.post.content), ("New title", "Test Content")
+        )
+
+    def test_patch_post_rejects_toxic_text(self):
+        response = self.patch(post_router, f"/{self.post.id}/", {"title": "You idiot"})
+
+        self.assertIn("blocked", response.json()["message"])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, "Test Post")
+
+    def test_patch_post_without_text_skips_moderation(self):
+        with mock.patch("posts.views.check_for_toxicity") as check:
+            self.patch(post_router, f"/{self.post.id}/", {"auto_reply_delay": 30})
+
+        check.assert_not_called()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.auto_reply_delay, 30)
+
+    def test_patch_missing_post_returns_404(self):
+        response = self.patch(post_router, "/999/", {"auto_reply_delay": 30})
+        self.assertEqual(response.status_code, 404)
+
+    def test_patch_comment_blocks_toxic_edit(self):
+        response = self.patch(
+            comment_router, f"/{self.comment.id}/", {"content": "You idiot"}
+        )
+
+        self.assertIn("blocked", response.json()["message"])
+        self.comment.refresh_from_db()
+        self.assertTrue(self.comment.blocked)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.comment_count, self.post.blocked_comment_count), (0, 1)
+        )
+        stats = DailyCommentStats.objects.get()
+        self.assertEqual((stats.total_comments, stats.blocked_comments), (1, 1))
+
+    def test_patch_comment_with_same_content_does_not_write(self):
+        with self.assertNumQueries(1):
+            self.patch(comment_router, f"/{self.comment.id}/", {"content": "Hi"})
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub", CACHES=LOCAL_CACHES)
+class PostDeletionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+        self.comments = [
+            Comment.objects.create(post=self.post, content=f"#{i}", author=self.user)
+            for i in range(5)
+        ]
+        AutoReplyJob.objects.create(comment=self.comments[0], run_at=timezone.now())
+        self.client = TestClient(post_router)
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def test_delete_hides_the_post_with_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.delete(
+                f"/{self.post.id}/", headers=self.auth_headers
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Comment.objects.count(), 5)
+        for path in (f"/{self.post.id}/", f"/{self.post.id}/comments"):
+            response = self.client.get(path, headers=self.auth_headers)
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            self.client.get("/", headers=self.auth_headers).json()["items"], []
+        )
+        self.assertEqual(claim_due_jobs(10), [])
+
+    def test_comments_of_deleted_post_count_as_missing(self):
+        self.client.delete(f"/{self.post.id}/", headers=self.auth_headers)
+        comments = TestClient(comment_router)
+        path = f"/{self.comments[1].id}/"
+
+        with mock.patch("posts.views.moderate") as moderate:
+            responses = [
+                comments.patch(
+                    path, json={"content": "New"}, headers=self.auth_headers
+                ),
+                comments.put(
+                    path,
+                    json={
+                        "post_id": self.post.id,
+                        "content": "New",
+                        "author_id": self.user.id,
+                    },
+                    headers=self.auth_headers,
+                ),
+                comments.delete(path, headers=self.auth_headers),
+            ]
+
+        self.assertEqual([response.status_code for response in responses], [404] * 3)
+        moderate.assert_not_called()
+        self.assertEqual(Comment.objects.get(id=self.comments[1].id).content, "#1")
+
+    def test_purge_removes_comments_in_batches(self):
+        self.client.delete(f"/{self.post.id}/", headers=self.auth_headers)
+
+        with mock.patch(
+            "posts.deletion.purge_comment_batch", wraps=purge_comment_batch
+        ) as purge_batch:
+            call_command(
+                "purge_deleted_posts", "--once", batch_size=2, stdout=StringIO()
+            )
+
+        self.assertEqual(purge_batch.call_count, 3)
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(AutoReplyJob.objects.exists())
+        self.assertEqual(DailyCommentStats.objects.get().total_comments, 0)
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client = TestClient(search_router)
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {"Authorization": f"Bearer {refresh.access_token}"}
+
+    def search(self, **params):
+        return self.client.get(f"?{urlencode(params)}", headers=self.auth_headers)
+
+    def ids(self, **params):
+        return [item["id"] for item in self.search(**params).json()["items"]]
+
+    def post(self, title, content="Body"):
+        return Post.objects.create(title=title, content=content, author=self.user)
+
+    def test_posts_are_ranked_and_paginated(self):
+        in_title = self.post("Django search", "Notes")
+        in_content = self.post("Notes", "Search works with Django too")
+        self.post("Unrelated", "Nothing here")
+
+        first = self.search(q="django search", limit=1).json()
+        second = self.search(q="django search", limit=1, cursor=first["next"]).json()
+
+        self.assertEqual([item["id"] for item in first["items"]], [in_title.id])
+        self.assertEqual([item["id"] for item in second["items"]], [in_content.id])
+        self.assertIsNone(second["next"])
+
+    def test_index_follows_writes(self):
+        post = self.post("Original title")
+        Post.objects.filter(id=post.id).update(title="Renamed title")
+        self.assertEqual(self.ids(q="original"), [])
+        self.assertEqual(self.ids(q="renamed"), [post.id])
+
+        Post.objects.filter(id=post.id).update(deleted_at=timezone.now())
+        self.assertEqual(self.ids(q="renamed"), [])
+
+    def test_comments_skip_blocked_ones(self):
+        post = self.post("Post")
+        visible = Comment.objects.create(
+            post=post, content="Lovely weather", author=self.user
+        )
+        blocked = Comment.objects.create(
+            post=post, content="Lovely spam", author=self.user, blocked=True
+        )
+        self.assertEqual(self.ids(q="lovely", scope="comments"), [visible.id])
+
+        Comment.objects.filter(id=blocked.id).update(blocked=False)
+        visible.delete()
+        self.assertEqual(self.ids(q="lovely", scope="comments"), [blocked.id])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.ids(q="lovely", scope="comments"), [blocked.id])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.post("Quotes")
+        response = self.search(q='quotes" OR NEAR(')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(q="*"), [])
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_metrics_endpoint_reports_requests_and_inference(self):
+        check_for_toxicity("Fresh text for the classifier")
+        Client().get("/api/health/ready")
+
+        response = Client().get("/api/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'posts_request_seconds_count{method="GET",route="api/health/ready"} 1',
+            body,
+        )
+        self.assertIn(
+            'posts_request_db_queries_bucket{method="GET",route="api/health/ready",le="0"} 1',
+            body,
+        )
+        self.assertIn('posts_inference_batch_size_count{model="classifier"}', body)
+        self.assertIn('posts_auto_reply_jobs{state="pending"} 0', body)
+
+    async def test_middleware_stays_async_for_async_views(self):
+        async def view(request):
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(view)
+        request = RequestFactory().get("/anything")
+        request.resolver_match = None
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'posts_request_seconds_count{method="GET",route="unmatched"} 1',
+            metrics.render(),
+        )
+
+    async def test_async_views_count_queries_run_in_threads(self):
+        async def view(request):
+            await sync_to_async(list)(User.objects.all())
+            await sync_to_async(User.objects.count)()
+            return HttpResponse()
+
+        request = RequestFactory().get("/anything")
+        request.resolver_match = None
+
+        await MetricsMiddleware(view)(request)
+
+        self.assertIn(
+            'posts_request_db_queries_sum{method="GET",route="unmatched"} 2',
+            metrics.render(),
+        )
+
+    def test_sampled_requests_are_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(
+                POSTS_PROFILE_SAMPLE_RATE=1.0, POSTS_PROFILE_DIR=directory
+            ):
+                Client().get("/api/health/ready")
+
+            self.assertEqual(len(list(Path(directory).glob("*.prof"))), 1)
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
+class AdmissionControlTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.other = User.objects.create_user(username="other", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+
+    def comment(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return TestClient(comment_router).post(
+            "/create",
+            json={"post_id": self.post.id, "content": "Great", "author_id": user.id},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    @override_settings(
+        POSTS_ADMISSION_LIMITS={"create_comment": {"user_rate": 0.01, "user_burst": 1}}
+    )
+    def test_user_over_rate_gets_429(self):
+        self.assertEqual(self.comment(self.user).status_code, 200)
+
+        response = self.comment(self.user)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "100")
+        self.assertEqual(self.comment(self.other).status_code, 200)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    @override_settings(
+        POSTS_ADMISSION_LIMITS={
+            "create_comment": {"concurrency": 1, "user_rate": 0.01, "user_burst": 1}
+        }
+    )
+    def test_shed_request_keeps_user_rate(self):
+        limiter = get_limiter("create_comment")
+        limiter.admit("busy")
+        try:
+            self.assertEqual(self.comment(self.user).status_code, 503)
+        finally:
+            limiter.release()
+
+        self.assertEqual(self.comment(self.user).status_code, 200)
+
+    def test_rates_below_one_per_second_admit_a_burst_of_one(self):
+        for limiter, status in [
+            (EndpointLimiter(rate=0.5), 503),
+            (EndpointLimiter(user_rate=0.5), 429),
+        ]:
+            limiter.admit("user")
+            with self.assertRaises(Overloaded) as shed:
+                limiter.admit("user")
+            self.assertEqual(shed.exception.status, status)
+
+        with self.assertRaises(ImproperlyConfigured):
+            EndpointLimiter(user_rate=0.5, user_burst=0.5)
+
+    @override_settings(POSTS_ADMISSION_LIMITS={"create_comment": {"concurrency": 1}})
+    def test_saturated_endpoint_sheds_writes_but_not_reads(self):
+        limiter = get_limiter("create_comment")
+        limiter.admit("busy")
+        try:
+            response = self.comment(self.user)
+            token = RefreshToken.for_user(self.user).access_token
+            read = TestClient(post_router).get(
+                f"/{self.post.id}/comments",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        finally:
+            limiter.release()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(read.status_code, 200)
+        self.assertIn(
+            'posts_admission_rejected_total{endpoint="create_comment",reason="concurrency"} 1',
+            metrics.render(),
+        )
+        self.assertEqual(self.comment(self.user).status_code, 200)
+
+
+@override_settings(POSTS_INFERENCE_BACKEND="stub")
+class ToxicityScoreTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.post = Post.objects.create(
+            title="Test Post", content="Test Content", author=self.user
+        )
+
+    def comment(self, content, **fields):
+        return Comment.objects.create(
+            post=self.post, content=content, author=self.user, **fields
+        )
+
+    def counts(self):
+        self.post.refresh_from_db()
+        stats = DailyCommentStats.objects.get()
+        return (
+            self.post.comment_count,
+            self.post.blocked_comment_count,
+            stats.blocked_comments,
+        )
+
+    def test_new_comments_store_score_and_model(self):
+        token = RefreshToken.for_user(self.user).access_token
+        TestClient(comment_router).post(
+            "/create",
+            json={
+                "post_id": self.post.id,
+                "content": "I hate this layout",
+                "author_id": self.user.id,
+            },
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        comment = Comment.objects.get()
+        self.assertTrue(comment.blocked)
+        self.assertEqual(comment.toxicity_score, 0.99)
+        self.assertEqual(comment.moderation_model, "unitary/toxic-bert@stub")
+
+    def test_remoderation_is_sharded_and_resumable(self):
+        self.comment("Caching makes reads fast")
+        self.comment("What a stupid idea")
+        self.comment("Indexes help too")
+
+        with tempfile.TemporaryDirectory() as directory:
+            for shard in range(2):
+                call_command(
+                    "remoderate_comments",
+                    shard=shard,
+                    shards=2,
+                    batch_size=1,
+                    checkpoint=f"{directory}/shard-{shard}.json",
+                    stdout=StringIO(),
+                )
+            out = StringIO()
+            call_command(
+                "remoderate_comments",
+                "--all",
+                shard=0,
+                shards=2,
+                checkpoint=f"{directory}/shard-0.json",
+                stdout=out,
+            )
+
+        self.assertIn("Re-moderated 0 comment(s)", out.getvalue())
+        self.assertEqual(
+            [(c.toxicity_score, c.blocked) for c in Comment.objects.order_by("id")],
+            [(0.01, False), (0.99, True), (0.01, False)],
+        )
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+        out = StringIO()
+        call_command("remoderate_comments", stdout=out)
+        self.assertIn("Re-moderated 0 comment(s)", out.getvalue())
+
+    def test_threshold_change_runs_no_inference(self):
+        self.comment("Mild", toxicity_score=0.3)
+        self.comment("Harsh", toxicity_score=0.7, blocked=True)
+
+        with mock.patch("posts.moderation.classify_batch") as classify:
+            with self.settings(POSTS_TOXICITY_THRESHOLD=0.8):
+                call_command("apply_toxicity_threshold", stdout=StringIO())
+            self.assertEqual(self.counts(), (2, 0, 0))
+
+            with self.settings(POSTS_TOXICITY_THRESHOLD=0.2):
+                call_command("apply_toxicity_threshold", stdout=StringIO())
+            self.assertEqual(self.counts(), (0, 2, 2))
+
+        classify.assert_not_called()
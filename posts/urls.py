@@ -1,40 +1,77 @@
+from django.conf import settings
 from ninja import Router
 
-from .services import register_user, comments_daily_breakdown
-from .views import (
-    list_posts,
-    create_post,
-    retrieve_post,
-    update_post,
-    delete_post,
-    list_comments,
-    create_comment,
-    update_comment,
-    delete_comment,
+from . import async_views, views as sync_views
+from .admission import admission
+from .services import (
+    register_user,
+    comments_daily_breakdown,
+    metrics_view,
+    readiness,
 )
 
+# Async handlers only pay off under ASGI (see djangoProject/asgi.py).
+views = async_views if settings.POSTS_ASYNC_VIEWS else sync_views
+
 post_router = Router()
 comment_router = Router()
 user_router = Router()
 analytics_router = Router()
+health_router = Router()
+metrics_router = Router()
+search_router = Router()
 
 # Маршрути для постів
-post_router.add_api_operation("/", methods=["GET"], view_func=list_posts)
-post_router.add_api_operation("/create/", methods=["POST"], view_func=create_post)
-post_router.add_api_operation("/{post_id}/", methods=["GET"], view_func=retrieve_post)
-post_router.add_api_operation("/{post_id}/", methods=["PUT"], view_func=update_post)
-post_router.add_api_operation("/{post_id}/", methods=["DELETE"], view_func=delete_post)
+post_router.add_api_operation("/", methods=["GET"], view_func=views.list_posts)
+post_router.add_api_operation(
+    "/create/", methods=["POST"], view_func=admission("create_post")(views.create_post)
+)
+post_router.add_api_operation("/export", methods=["GET"], view_func=views.export_posts)
+post_router.add_api_operation(
+    "/{post_id}/", methods=["GET"], view_func=views.retrieve_post
+)
+post_router.add_api_operation(
+    "/{post_id}/", methods=["PUT"], view_func=views.update_post
+)
+post_router.add_api_operation(
+    "/{post_id}/",
+    methods=["PATCH"],
+    view_func=admission("patch_post")(views.patch_post),
+)
+post_router.add_api_operation(
+    "/{post_id}/", methods=["DELETE"], view_func=views.delete_post
+)
 
 # Маршрути для коментарів
 post_router.add_api_operation(
-    "/{post_id}/comments", methods=["GET"], view_func=list_comments
+    "/{post_id}/comments", methods=["GET"], view_func=views.list_comments
+)
+post_router.add_api_operation(
+    "/{post_id}/comments/export", methods=["GET"], view_func=views.export_post_comments
+)
+comment_router.add_api_operation(
+    "/create",
+    methods=["POST"],
+    view_func=admission("create_comment")(views.create_comment),
+)
+comment_router.add_api_operation(
+    "/bulk",
+    methods=["POST"],
+    view_func=admission("bulk_create_comments")(views.bulk_create_comments),
+)
+comment_router.add_api_operation(
+    "/export", methods=["GET"], view_func=views.export_comments
+)
+comment_router.add_api_operation(
+    "/{comment_id}/", methods=["PUT"], view_func=views.update_comment
 )
-comment_router.add_api_operation("/create", methods=["POST"], view_func=create_comment)
 comment_router.add_api_operation(
-    "/{comment_id}/", methods=["PUT"], view_func=update_comment
+    "/{comment_id}/",
+    methods=["PATCH"],
+    view_func=admission("patch_comment")(views.patch_comment),
 )
 comment_router.add_api_operation(
-    "/{comment_id}/", methods=["DELETE"], view_func=delete_comment
+    "/{comment_id}/", methods=["DELETE"], view_func=views.delete_comment
 )
 
 user_router.add_api_operation("/", methods=["POST"], view_func=register_user)
@@ -42,3 +79,9 @@ user_router.add_api_operation("/", methods=["POST"], view_func=register_user)
 analytics_router.add_api_operation(
     "/comments-daily-breakdown", methods=["GET"], view_func=comments_daily_breakdown
 )
+
+health_router.add_api_operation("/ready", methods=["GET"], view_func=readiness)
+
+metrics_router.add_api_operation("", methods=["GET"], view_func=metrics_view)
+
+search_router.add_api_operation("", methods=["GET"], view_func=views.search)
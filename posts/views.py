@@ -1,35 +1,147 @@
-import time
-from threading import Thread
+from datetime import date
+from typing import List, Literal
+
+from django.conf import settings
+from django.db import transaction
 from .models import Post, Comment
 from .schemas import (
     PostOutSchema,
     PostCreateSchema,
+    PostPatchSchema,
     CommentCreateSchema,
-    CommentOutSchema,
+    CommentPatchSchema,
 )
 from .models import User
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .services import check_for_toxicity
+from .deletion import soft_delete_post
+from .jobs import schedule_auto_replies, schedule_auto_reply
+from .moderation import is_toxic, moderate, moderate_many
+from .pagination import build_page, keyset_queryset, page_size
+from .renderers import dumps
+from .search import search_page
+from .response_cache import (
+    cached_response,
+    invalidate_post,
+    list_changed_at,
+    post_detail_key,
+    post_list_key,
+)
+from .stats import (
+    apply_comment_count_deltas,
+    apply_comment_deltas,
+    comment_count_deltas,
+    comment_deltas,
+    created_between,
+    record_comment_block_change,
+)
+
+
+# Read endpoints project only these columns with .values() and build plain
+# dicts shaped like PostOutSchema/CommentOutSchema, so no model instances or
+# schema objects are created per row.
+POST_FIELDS = (
+    "id",
+    "title",
+    "content",
+    "author_id",
+    "author__username",
+    "created_at",
+    "auto_reply_enabled",
+    "comment_count",
+    "blocked_comment_count",
+)
+COMMENT_FIELDS = ("id", "content", "author__username", "created_at")
+SEARCH_COMMENT_FIELDS = COMMENT_FIELDS + ("post_id",)
+EXPORT_POST_FIELDS = POST_FIELDS + ("auto_reply_delay",)
+EXPORT_COMMENT_FIELDS = (
+    "id",
+    "post_id",
+    "content",
+    "author_id",
+    "author__username",
+    "created_at",
+    "blocked",
+)
+
+
+def post_row(row):
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "content": row["content"],
+        "author": {"id": row["author_id"], "username": row["author__username"]},
+        "created_at": row["created_at"],
+        "auto_reply_enabled": row["auto_reply_enabled"],
+        "comment_count": row["comment_count"],
+        "blocked_comment_count": row["blocked_comment_count"],
+    }
+
+
+def comment_row(row):
+    return {
+        "id": row["id"],
+        "content": row["content"],
+        "author": row["author__username"],
+        "created_at": row["created_at"],
+    }
+
+
+def comment_search_row(row):
+    return {**comment_row(row), "post_id": row["post_id"]}
+
+
+def post_export_row(row):
+    return {**post_row(row), "auto_reply_delay": row["auto_reply_delay"]}
+
+
+def comment_export_row(row):
+    return {
+        "id": row["id"],
+        "post_id": row["post_id"],
+        "content": row["content"],
+        "author": {"id": row["author_id"], "username": row["author__username"]},
+        "created_at": row["created_at"],
+        "blocked": row["blocked"],
+    }
+
 
-from .services import check_for_toxicity, generate_reply
+def ndjson_lines(rows, serialize):
+    for row in rows:
+        yield dumps(serialize(row)) + b"\n"
 
 
-def list_posts(request):
-    posts = Post.objects.all().prefetch_related("author")
+def ndjson_response(lines, filename):
+    response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
-    return [
-        PostOutSchema(
-            id=post.id,
-            title=post.title,
-            content=post.content,
-            author={
-                "id": post.author.id,
-                "username": post.author.username,
-            },
-            created_at=post.created_at,
-            auto_reply_enabled=post.auto_reply_enabled,
+
+def invalid_cursor():
+    return JsonResponse({"error": "Invalid cursor."}, status=400)
+
+
+def live_comments():
+    """Comments whose post is not soft-deleted; the others count as missing."""
+    return Comment.objects.filter(post__deleted_at__isnull=True)
+
+
+def list_posts(request, cursor: str = None, limit: int = None):
+    limit = page_size(limit)
+    try:
+        posts = keyset_queryset(
+            Post.objects.values(*POST_FIELDS), cursor, limit, descending=True
         )
-        for post in posts
-    ]
+    except ValueError:
+        return invalid_cursor()
+
+    def build():
+        return build_page(posts, limit, post_row), list_changed_at()
+
+    return cached_response(request, post_list_key(cursor, limit), build)
 
 
 def create_post(request, data: PostCreateSchema):
@@ -46,40 +158,74 @@ def create_post(request, data: PostCreateSchema):
         auto_reply_delay=data.auto_reply_delay,
     )
 
+    invalidate_post()
     return {"message": "Post created successfully", "post": post.id}
 
 
 def retrieve_post(request, post_id: int) -> PostOutSchema:
-    post = get_object_or_404(Post, id=post_id)
-    return PostOutSchema(
-        id=post.id,
-        title=post.title,
-        content=post.content,
-        author={
-            "id": post.author.id,
-            "username": post.author.username,
-        },
-        created_at=post.created_at,
-        auto_reply_enabled=post.auto_reply_enabled,
-    )
+    def build():
+        post = get_object_or_404(
+            Post.objects.values(*POST_FIELDS, "updated_at"), id=post_id
+        )
+        return post_row(post), post["updated_at"]
+
+    return cached_response(request, post_detail_key(post_id), build)
 
 
 def update_post(request, post_id: int, data: PostCreateSchema):
     post = get_object_or_404(Post, id=post_id)
-    for attr, value in data.model_dump().items():
+    fields = data.model_dump()
+    for attr, value in fields.items():
         if attr == "author":
             post.author = get_object_or_404(
                 User, id=value
             )
         else:
             setattr(post, attr, value)
-    post.save()
+    # A full save would write back the comment counters read above and undo
+    # any increment that landed in between.
+    post.save(update_fields=[*fields, "updated_at"])
+    invalidate_post(post_id)
     return {"message": "Post updated successfully"}
 
 
+def edit_post(post_id, changes):
+    """Apply the supplied fields to a post with a single UPDATE.
+
+    Only the title or content that actually changed is re-moderated.
+    """
+    texts = {
+        field: changes[field] for field in ("title", "content") if field in changes
+    }
+    if texts:
+        current = get_object_or_404(Post.objects.values(*texts), id=post_id)
+        if any(
+            check_for_toxicity(value)
+            for field, value in texts.items()
+            if value != current[field]
+        ):
+            return {"message": "Post is blocked due to inappropriate content."}
+
+    if "author" in changes:
+        get_object_or_404(User.objects.values("id"), id=changes["author"])
+        changes["author_id"] = changes.pop("author")
+
+    if not Post.objects.filter(id=post_id).update(**changes, updated_at=timezone.now()):
+        raise Http404("No Post matches the given query.")
+    invalidate_post(post_id)
+    return {"message": "Post updated successfully"}
+
+
+def patch_post(request, post_id: int, data: PostPatchSchema):
+    return edit_post(post_id, data.model_dump(exclude_none=True))
+
+
 def delete_post(request, post_id: int):
-    post = get_object_or_404(Post, id=post_id)
-    post.delete()
+    # Comments are purged later by `manage.py purge_deleted_posts`, so this
+    # is one UPDATE however many comments the post has.
+    if not soft_delete_post(post_id):
+        raise Http404("No Post matches the given query.")
+    invalidate_post(post_id)
     return {"message": "Post deleted successfully"}
 
 
@@ -87,61 +233,229 @@ def create_comment(request, data: CommentCreateSchema):
     post = get_object_or_404(Post, id=data.post_id)
     author = get_object_or_404(User, id=data.author_id)
 
-    if check_for_toxicity(data.content):
+    score, model = moderate(data.content)
+    if is_toxic(score):
         Comment.objects.create(
             post=post,
             content=data.content,
             author=author,
             blocked=True,
+            toxicity_score=score,
+            moderation_model=model,
         )
         return {"message": "Comment is blocked due to inappropriate content."}
 
-    Comment.objects.create(
-        post_id=data.post_id,
-        content=data.content,
-        author=author,
-    )
-    if post.auto_reply_enabled:
-
-        def thread_target(post_content, comment_content):
-            time.sleep(post.auto_reply_delay)
-            auto_reply = generate_reply(post_content, comment_content)
-            Comment.objects.create(
-                post=post,
-                content=auto_reply,
-                author=post.author,
-                blocked=False,
-            )
-        Thread(target=thread_target, args=(post.content, data.content)).start()
+    save_comment(post, author, data.content, score, model)
 
     return {
         "message": "Comment created successfully and auto-reply generated if enabled."
     }
 
 
-def list_comments(request, post_id: int):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.filter(blocked=False).select_related("author")
-
-    return [
-        CommentOutSchema(
-            id=comment.id,
-            content=comment.content,
-            author=comment.author.username,
-            created_at=comment.created_at,
+def save_comment(post, author, content, toxicity_score=None, moderation_model=""):
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            post=post,
+            content=content,
+            author=author,
+            toxicity_score=toxicity_score,
+            moderation_model=moderation_model,
         )
-        for comment in comments
+        if post.auto_reply_enabled:
+            schedule_auto_reply(comment, post)
+    return comment
+
+
+def ingest_comments(items):
+    posts = Post.objects.in_bulk({item.post_id for item in items})
+    authors = User.objects.in_bulk({item.author_id for item in items})
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if item.post_id not in posts:
+            error = f"Post with id {item.post_id} does not exist."
+        elif item.author_id not in authors:
+            error = f"User with id {item.author_id} does not exist."
+        else:
+            valid.append(index)
+            continue
+        results[index] = {"index": index, "status": "error", "error": error}
+
+    moderated = moderate_many([items[index].content for index in valid])
+    comments = [
+        Comment(
+            post=posts[items[index].post_id],
+            author=authors[items[index].author_id],
+            content=items[index].content,
+            blocked=is_toxic(score),
+            toxicity_score=score,
+            moderation_model=model,
+        )
+        for index, (score, model) in zip(valid, moderated)
     ]
 
+    # bulk_create skips the model signals, so the rollups are updated here.
+    with transaction.atomic():
+        Comment.objects.bulk_create(
+            comments, batch_size=settings.POSTS_BULK_INSERT_BATCH_SIZE
+        )
+        apply_comment_deltas(
+            comment_deltas(
+                (comment.created_at, comment.blocked) for comment in comments
+            )
+        )
+        apply_comment_count_deltas(
+            comment_count_deltas(
+                (comment.post_id, comment.blocked) for comment in comments
+            )
+        )
+        schedule_auto_replies(
+            comment
+            for comment in comments
+            if not comment.blocked and comment.post.auto_reply_enabled
+        )
+
+    for index, comment in zip(valid, comments):
+        results[index] = {
+            "index": index,
+            "status": "blocked" if comment.blocked else "accepted",
+            "id": comment.id,
+        }
+    return results
+
+
+def bulk_create_comments(request, data: List[CommentCreateSchema]):
+    if len(data) > settings.POSTS_BULK_MAX_ITEMS:
+        return JsonResponse(
+            {"error": f"At most {settings.POSTS_BULK_MAX_ITEMS} comments per request."},
+            status=400,
+        )
+    return {"results": ingest_comments(data)}
+
+
+def list_comments(request, post_id: int, cursor: str = None, limit: int = None):
+    post = get_object_or_404(Post, id=post_id)
+    limit = page_size(limit)
+    try:
+        comments = keyset_queryset(
+            post.comments.filter(blocked=False).values(*COMMENT_FIELDS),
+            cursor,
+            limit,
+        )
+    except ValueError:
+        return invalid_cursor()
+
+    return build_page(comments, limit, comment_row)
+
 
 def update_comment(request, comment_id: int, data: CommentCreateSchema):
-    comment = get_object_or_404(Comment, id=comment_id)
+    comment = get_object_or_404(live_comments(), id=comment_id)
     comment.content = data.content
+    # PUT does not moderate, so the old score no longer applies.
+    comment.toxicity_score = None
+    comment.moderation_model = ""
     comment.save()
     return {"message": "Comment updated successfully"}
 
 
+def edit_comment(comment_id, changes):
+    """Re-moderate and write a comment's content only if it changed."""
+    while True:
+        comment = get_object_or_404(
+            live_comments().values("post_id", "content", "created_at", "blocked"),
+            id=comment_id,
+        )
+        content = changes.get("content", comment["content"])
+        if content == comment["content"]:
+            return {"message": "Comment updated successfully"}
+
+        score, model = moderate(content)
+        blocked = is_toxic(score)
+        with transaction.atomic():
+            # Matching on the blocked flag we read means a concurrent edit
+            # cannot make the counters move twice; on a miss, read again.
+            updated = (
+                live_comments()
+                .filter(id=comment_id, blocked=comment["blocked"])
+                .update(
+                    content=content,
+                    blocked=blocked,
+                    toxicity_score=score,
+                    moderation_model=model,
+                )
+            )
+            if updated and blocked != comment["blocked"]:
+                record_comment_block_change(
+                    comment["post_id"], comment["created_at"], blocked
+                )
+        if updated:
+            break
+
+    if blocked:
+        return {"message": "Comment is blocked due to inappropriate content."}
+    return {"message": "Comment updated successfully"}
+
+
+def patch_comment(request, comment_id: int, data: CommentPatchSchema):
+    return edit_comment(comment_id, data.model_dump(exclude_none=True))
+
+
 def delete_comment(request, comment_id: int):
-    comment = get_object_or_404(Comment, id=comment_id)
+    comment = get_object_or_404(live_comments(), id=comment_id)
     comment.delete()
     return {"message": "Comment deleted successfully"}
+
+
+def export_posts(request, date_from: date = None, date_to: date = None):
+    posts = created_between(Post.objects.all(), date_from, date_to)
+    rows = posts.order_by("created_at", "id").values(*EXPORT_POST_FIELDS)
+    return ndjson_response(
+        ndjson_lines(
+            rows.iterator(chunk_size=settings.POSTS_EXPORT_CHUNK_SIZE), post_export_row
+        ),
+        "posts.ndjson",
+    )
+
+
+def export_comments(request, date_from: date = None, date_to: date = None):
+    comments = created_between(live_comments(), date_from, date_to)
+    rows = comments.order_by("created_at", "id").values(*EXPORT_COMMENT_FIELDS)
+    return ndjson_response(
+        ndjson_lines(
+            rows.iterator(chunk_size=settings.POSTS_EXPORT_CHUNK_SIZE),
+            comment_export_row,
+        ),
+        "comments.ndjson",
+    )
+
+
+def export_post_comments(request, post_id: int):
+    post = get_object_or_404(Post, id=post_id)
+    rows = post.comments.order_by("created_at", "id").values(*EXPORT_COMMENT_FIELDS)
+    return ndjson_response(
+        ndjson_lines(
+            rows.iterator(chunk_size=settings.POSTS_EXPORT_CHUNK_SIZE),
+            comment_export_row,
+        ),
+        f"post-{post_id}-comments.ndjson",
+    )
+
+
+def search(
+    request,
+    q: str,
+    scope: Literal["posts", "comments"] = "posts",
+    cursor: str = None,
+    limit: int = None,
+):
+    limit = page_size(limit)
+    if scope == "posts":
+        rows, serialize = Post.objects.values(*POST_FIELDS), post_row
+    else:
+        rows = Comment.objects.values(*SEARCH_COMMENT_FIELDS)
+        serialize = comment_search_row
+    try:
+        return search_page(scope, q, cursor, limit, rows, serialize)
+    except ValueError:
+        return invalid_cursor()